@@ -1,7 +1,12 @@
 import jieba
 import re
 import json
-from collections import Counter
+import hashlib
+import os
+import threading
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from pool_utils import pool_context
 
 # English stopwords (you can expand this list)
 ENGLISH_STOPWORDS = set([
@@ -14,14 +19,88 @@ def load_esg_keywords(json_path="esg_keywords.json"):
         keywords = json.load(f)
     return keywords
 
-def extract_words(text: str):
-    """Auto detect whether the text is Chinese or English, and segment it."""
+# 中文字比例超過此值就視為中文文件
+CHINESE_RATIO_THRESHOLD = 0.3
+# 最多保留幾份文件的斷詞結果
+MAX_CACHED_DOCUMENTS = 4
+
+# 中文文字超過此長度時改用 process pool 分段斷詞
+PARALLEL_SEGMENT_MIN_CHARS = 200_000
+SEGMENT_CHUNK_CHARS = 50_000
+
+_DOCUMENT_CACHE = OrderedDict()
+_DOCUMENT_CACHE_LOCK = threading.Lock()
+
+# jieba 只在這些字元之外切 block（同 jieba.re_han_default），在此切段不影響斷詞結果
+_JIEBA_BLOCK_BOUNDARY = re.compile(r"[^\u4E00-\u9FD5a-zA-Z0-9+#&\._%\-]")
+_SENTENCE_BOUNDARY = re.compile(r"[。！？；!?;\n]")
+_jieba_user_words = None
+
+def _init_jieba(user_words):
+    """Load jieba's dictionary once per process and register ESG keywords as user words."""
+    global _jieba_user_words
+    if _jieba_user_words == user_words:
+        return
+    jieba.initialize()
+    for word in user_words:
+        jieba.add_word(word)
+    _jieba_user_words = user_words
+
+def esg_user_words(json_path="esg_keywords.json"):
+    """Chinese ESG keywords (碳排放, 循環經濟, ...) that jieba must keep as single tokens."""
+    esg_keywords = load_esg_keywords(json_path)
+    return tuple(sorted({
+        w for words in esg_keywords.values() for w in words if re.search(r'[\u4e00-\u9fff]', w)
+    }))
+
+def split_for_segmentation(text: str, chunk_chars: int = SEGMENT_CHUNK_CHARS):
+    """Split ``text`` into ~chunk_chars pieces at sentence ends (or other jieba block boundaries)."""
+    chunks = []
+    start = 0
+    while len(text) - start > chunk_chars:
+        target = start + chunk_chars
+        match = _SENTENCE_BOUNDARY.search(text, target, target + chunk_chars) or _JIEBA_BLOCK_BOUNDARY.search(text, target)
+        if match is None:
+            break
+        chunks.append(text[start:match.end()])
+        start = match.end()
+    chunks.append(text[start:])
+    return chunks
+
+def _segment_chinese_chunk(chunk: str):
+    return [w.strip() for w in jieba.lcut(chunk) if re.match(r"^[\u4e00-\u9fff]{2,}$", w)]
+
+def segment_chinese(text: str, workers: int = None, user_words=None):
+    """jieba segmentation of ``text``, chunked across a process pool for large inputs.
+
+    The result is identical to the serial path: chunks are cut only where jieba itself starts a
+    new block, and every worker registers the same ESG user words.
+    """
+    user_words = esg_user_words() if user_words is None else tuple(user_words)
+    workers = workers or os.cpu_count() or 1
+    chunks = split_for_segmentation(text)
+
+    if workers == 1 or len(chunks) == 1 or len(text) < PARALLEL_SEGMENT_MIN_CHARS:
+        _init_jieba(user_words)
+        return _segment_chinese_chunk(text)
+
+    words = []
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks)),
+                             mp_context=pool_context(),
+                             initializer=_init_jieba, initargs=(user_words,)) as executor:
+        # map 會依 chunk 順序回傳
+        for chunk_words in executor.map(_segment_chinese_chunk, chunks):
+            words.extend(chunk_words)
+    return words
+
+def chinese_ratio(text: str):
     chinese_characters = re.findall(r'[\u4e00-\u9fff]', text)
-    chinese_ratio = len(chinese_characters) / (len(text) + 1e-5)
+    return len(chinese_characters) / (len(text) + 1e-5)
 
-    if chinese_ratio > 0.3:
+def _segment(text: str, is_chinese: bool, workers: int = None):
+    if is_chinese:
         # Chinese text
-        words = [w.strip() for w in jieba.lcut(text) if re.match(r"^[\u4e00-\u9fff]{2,}$", w)]
+        words = segment_chinese(text, workers=workers)
     else:
         # English text
         words = [w.strip().lower() for w in text.split() if w.isalpha()]
@@ -29,14 +108,154 @@ def extract_words(text: str):
 
     return words
 
-def analyze_esg_text(text: str, esg_keywords: dict, top_n: int = 10):
-    words = extract_words(text)
-    freq = Counter(words)
+def tokenize_document(text: str, workers: int = None):
+    """Language detection, token list and frequency table for ``text``, memoised per document hash.
+
+    Returns a dict with "hash", "lang" ("zh"/"en"), "chinese_ratio", "words", "freq" and
+    "normalized" (the text as KeywordMatcher scans it), shared by ESG scoring and the word cloud.
+    """
+    key = hashlib.sha1(text.encode("utf-8")).hexdigest()
+    with _DOCUMENT_CACHE_LOCK:
+        document = _DOCUMENT_CACHE.get(key)
+        if document is not None:
+            _DOCUMENT_CACHE.move_to_end(key)
+            return document
+
+    ratio = chinese_ratio(text)
+    is_chinese = ratio > CHINESE_RATIO_THRESHOLD
+    words = _segment(text, is_chinese, workers=workers)
+    document = {
+        "hash": key,
+        "lang": "zh" if is_chinese else "en",
+        "chinese_ratio": ratio,
+        "words": words,
+        "freq": Counter(words),
+        "normalized": normalize_text(text),
+    }
+
+    with _DOCUMENT_CACHE_LOCK:
+        _DOCUMENT_CACHE[key] = document
+        while len(_DOCUMENT_CACHE) > MAX_CACHED_DOCUMENTS:
+            _DOCUMENT_CACHE.popitem(last=False)
+    return document
+
+def extract_words(text: str):
+    """Auto detect whether the text is Chinese or English, and segment it."""
+    return tokenize_document(text)["words"]
+
+def normalize_text(text: str):
+    """Lowercase and collapse whitespace so multi-word keywords match across line breaks."""
+    return re.sub(r"\s+", " ", text.lower())
+
+def normalize_keyword(keyword: str):
+    return normalize_text(keyword).strip()
+
+def _is_word_char(ch):
+    return ch.isascii() and ch.isalnum()
+
+class KeywordMatcher:
+    """Aho–Corasick automaton over every ESG keyword (single- and multi-word, English and Chinese).
+
+    Built once from the keyword file; ``count`` scans the text in a single pass for all three
+    dimensions. English keywords only match on word boundaries, Chinese keywords match anywhere,
+    and overlapping hits resolve to the leftmost-longest keyword (碳排放 is not also counted as 碳排).
+    """
 
+    def __init__(self, esg_keywords: dict):
+        self.keywords = []  # normalized keywords, indexed by keyword id
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+
+        for dim in ["Environmental", "Social", "Governance"]:
+            for keyword in esg_keywords.get(dim, []):
+                normalized = normalize_keyword(keyword)
+                if normalized and normalized not in self.keywords:
+                    self._insert(normalized, len(self.keywords))
+                    self.keywords.append(normalized)
+        self._build_fail_links()
+
+    def _insert(self, normalized, keyword_id):
+        state = 0
+        for ch in normalized:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((keyword_id, len(normalized), _is_word_char(normalized[0]), _is_word_char(normalized[-1])))
+
+    def _build_fail_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0) if state else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, normalized: str):
+        """All (start, end, keyword_id) hits in already-normalized text, before overlap resolution."""
+        goto, fail, out = self._goto, self._fail, self._out
+        n = len(normalized)
+        hits = []
+        state = 0
+        for i, ch in enumerate(normalized):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for keyword_id, length, word_start, word_end in out[state]:
+                start = i - length + 1
+                if word_start and start > 0 and _is_word_char(normalized[start - 1]):
+                    continue
+                if word_end and i + 1 < n and _is_word_char(normalized[i + 1]):
+                    continue
+                hits.append((start, i + 1, keyword_id))
+        return hits
+
+    def count(self, text: str, normalized: bool = False):
+        """Counter of normalized keyword -> non-overlapping occurrences in ``text``."""
+        hits = self.find(text if normalized else normalize_text(text))
+        hits.sort(key=lambda h: (h[0], -h[1]))
+        counts = Counter()
+        covered = 0
+        for start, end, keyword_id in hits:
+            if start >= covered:
+                counts[self.keywords[keyword_id]] += 1
+                covered = end
+        return counts
+
+_MATCHER_CACHE = {}
+
+def compile_esg_matcher(esg_keywords: dict):
+    """KeywordMatcher for ``esg_keywords``, compiled once per distinct keyword set."""
+    key = json.dumps(esg_keywords, sort_keys=True, ensure_ascii=False)
+    matcher = _MATCHER_CACHE.get(key)
+    if matcher is None:
+        matcher = _MATCHER_CACHE[key] = KeywordMatcher(esg_keywords)
+    return matcher
+
+def analyze_esg_text(text: str, esg_keywords: dict, top_n: int = 10, document: dict = None):
+    matcher = compile_esg_matcher(esg_keywords)
+    if document is not None:
+        freq = matcher.count(document["normalized"], normalized=True)
+    else:
+        freq = matcher.count(text)
+
+    return build_esg_results(freq, esg_keywords, top_n=top_n)
+
+def build_esg_results(freq: Counter, esg_keywords: dict, top_n: int = 10):
+    """Turn keyword counts into the {dim: {"count", "keywords", "ratio"}} result of analyze_esg_text."""
     results = {}
     for dim in ["Environmental", "Social", "Governance"]:
         keywords = esg_keywords.get(dim, [])
-        filtered = {w: freq[w] for w in keywords if w in freq}
+        filtered = {w: freq[normalize_keyword(w)] for w in keywords if freq[normalize_keyword(w)]}
         count = sum(filtered.values())
         results[dim] = {
             "count": count,
@@ -49,14 +268,106 @@ def analyze_esg_text(text: str, esg_keywords: dict, top_n: int = 10):
 
     return results
 
-def display_esg_analysis(text: str, filename: str, json_path="esg_keywords.json", top_n=10):
+class EsgPageIndex:
+    """Per-page ESG keyword counts with incrementally maintained document totals.
+
+    ``update`` only scores pages that are new or whose content changed, so whole-document
+    ratios are a lookup and page ranges are a sum of cached per-page counts. Keywords split
+    across a page break are not counted (each page is scored on its own).
+    """
+
+    def __init__(self, esg_keywords: dict):
+        self.esg_keywords = esg_keywords
+        self._matcher = compile_esg_matcher(esg_keywords)
+        self._dimension_keywords = {
+            dim: {normalize_keyword(w) for w in esg_keywords.get(dim, [])}
+            for dim in ["Environmental", "Social", "Governance"]
+        }
+        self._pages = {}  # page number -> (hash(content), Counter)
+        self._totals = Counter()
+        # 已讀過的 PageStore 頁數與修改紀錄位置，下次只讀之後新增/修改的頁面
+        self._stored_seen = 0
+        self._revisions_seen = 0
+
+    def _score(self, p):
+        content_hash = hash(p["content"])
+        previous = self._pages.get(p["page"])
+        if previous is not None and previous[0] == content_hash:
+            return 0
+        counts = self._matcher.count(p["content"])
+        if previous is not None:
+            self._totals.subtract(previous[1])
+        self._totals.update(counts)
+        self._pages[p["page"]] = (content_hash, counts)
+        return 1
+
+    def update(self, pages):
+        """Score pages not seen before; returns how many pages were (re)scored.
+
+        A PageStore is append-only, so only pages stored since the last call and pages whose
+        content was replaced (on-demand tables) are read. Any other iterable is fully rescanned.
+        """
+        if not hasattr(pages, "iter_from"):
+            return sum(self._score(p) for p in pages)
+
+        scored = 0
+        for p in pages.iter_from(self._stored_seen):
+            scored += self._score(p)
+            self._stored_seen += 1
+        revised, self._revisions_seen = pages.revisions_since(self._revisions_seen)
+        for page_number in dict.fromkeys(revised):
+            p = pages.get(page_number)
+            if p is not None:
+                scored += self._score(p)
+        return scored
+
+    def counts(self, start=None, end=None):
+        if start is None and end is None:
+            return +self._totals
+        start = 1 if start is None else start
+        end = max(self._pages, default=0) if end is None else end
+        freq = Counter()
+        for page_number, (_, counts) in self._pages.items():
+            if start <= page_number <= end:
+                freq.update(counts)
+        return freq
+
+    def results(self, start=None, end=None, top_n: int = 10):
+        """Same shape as analyze_esg_text, for the whole document or pages start..end (inclusive)."""
+        return build_esg_results(self.counts(start, end), self.esg_keywords, top_n=top_n)
+
+    def dimension_counts_by_page(self, start=None, end=None):
+        """{page: {dim: count}} in page order, to show where in the report each dimension is emphasized."""
+        by_page = {}
+        for page_number in sorted(self._pages):
+            if (start is not None and page_number < start) or (end is not None and page_number > end):
+                continue
+            counts = self._pages[page_number][1]
+            by_page[page_number] = {
+                dim: sum(c for w, c in counts.items() if w in keywords)
+                for dim, keywords in self._dimension_keywords.items()
+            }
+        return by_page
+
+def display_esg_analysis(text: str, filename: str, json_path="esg_keywords.json", top_n=10,
+                         page_index: EsgPageIndex = None, page_range=None):
     import streamlit as st
     import matplotlib.pyplot as plt
     from wordcloud import WordCloud
     import os
 
     esg_keywords = load_esg_keywords(json_path)
-    results = analyze_esg_text(text, esg_keywords, top_n=top_n)
+    # 語言判斷與斷詞只做一次，ESG 計分與文字雲共用
+    document = tokenize_document(text)
+    start, end = page_range if page_range else (None, None)
+    if page_index is not None:
+        # 已有逐頁計數時直接加總，不必重新掃描全文
+        results = page_index.results(start, end, top_n=top_n)
+    else:
+        results = analyze_esg_text(text, esg_keywords, top_n=top_n, document=document)
+
+    if page_range:
+        filename = f"{filename} (pages {start}-{end})"
 
     # Safer Markdown without emoji to avoid UnicodeEncodeError
     st.markdown(f"# ESG Analysis for `{filename}`")
@@ -83,15 +394,28 @@ def display_esg_analysis(text: str, filename: str, json_path="esg_keywords.json"
     ax.set_ylim(0, 1)
     st.pyplot(fig)
 
+    # ESG emphasis per page
+    if page_index is not None:
+        by_page = page_index.dimension_counts_by_page(start, end)
+        if by_page:
+            st.markdown("## 📑 ESG Keywords by Page")
+            pages = list(by_page)
+            fig, ax = plt.subplots(figsize=(10, 4))
+            bottom = [0] * len(pages)
+            for dim, color in [("Environmental", "seagreen"), ("Social", "orange"), ("Governance", "steelblue")]:
+                values = [by_page[p][dim] for p in pages]
+                ax.bar(pages, values, bottom=bottom, label=dim, color=color)
+                bottom = [b + v for b, v in zip(bottom, values)]
+            ax.set_xlabel("Page")
+            ax.set_ylabel("Keyword count")
+            ax.legend()
+            st.pyplot(fig)
+
     # Word Cloud Section
     st.markdown("## ☁️ ESG Keyword Word Cloud")
-    words = extract_words(text)
-    full_freq = Counter(words)
-
-    chinese_characters = re.findall(r'[\u4e00-\u9fff]', text)
-    chinese_ratio = len(chinese_characters) / (len(text) + 1e-5)
+    full_freq = document["freq"]
 
-    if chinese_ratio > 0.3:
+    if document["lang"] == "zh":
         # Chinese wordcloud
         font_path = "fonts/NotoSansTC-VariableFont_wght.ttf"
         if not os.path.exists(font_path):
@@ -0,0 +1,108 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+DEFAULT_AVATAR_URL = "https://www.w3schools.com/howto/img_avatar.png"
+AVATAR_CHECK_TIMEOUT = 2          # 單次檢查的逾時秒數
+AVATAR_VALID_TTL = 3600           # 有效網址的快取秒數
+AVATAR_INVALID_TTL = 300          # 無效網址也快取，避免每次 rerun 重試
+AVATAR_CHECK_WORKERS = 2
+
+def check_image_url(url, timeout=AVATAR_CHECK_TIMEOUT):
+    """True if ``url`` answers 200/206 with an image content type, without downloading the body.
+
+    Tries HEAD first; servers that reject HEAD or omit the content type get a streamed
+    GET for the first byte only.
+    """
+    try:
+        response = requests.head(url, timeout=timeout, allow_redirects=True)
+        content_type = response.headers.get("Content-Type", "")
+        if response.status_code == 200 and content_type:
+            return "image" in content_type
+        if response.status_code not in (200, 403, 405, 501):
+            return False
+        with requests.get(url, timeout=timeout, stream=True,
+                          headers={"Range": "bytes=0-0"}) as response:
+            return response.status_code in (200, 206) and "image" in response.headers.get("Content-Type", "")
+    except requests.RequestException:
+        return False
+
+class AvatarValidator:
+    """URL -> valid/invalid cache with TTL; checks run on a background thread pool."""
+
+    def __init__(self, checker=check_image_url, valid_ttl=AVATAR_VALID_TTL,
+                 invalid_ttl=AVATAR_INVALID_TTL, workers=AVATAR_CHECK_WORKERS, clock=time.monotonic):
+        self._checker = checker
+        self._valid_ttl = valid_ttl
+        self._invalid_ttl = invalid_ttl
+        self._clock = clock
+        self._results = {}    # url -> (is_valid, checked_at)
+        self._pending = {}    # url -> Future
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="avatar-check")
+
+    def _fresh(self, url):
+        cached = self._results.get(url)
+        if cached is None:
+            return None
+        is_valid, checked_at = cached
+        ttl = self._valid_ttl if is_valid else self._invalid_ttl
+        return cached if self._clock() - checked_at < ttl else None
+
+    def _run_check(self, url):
+        try:
+            is_valid = bool(self._checker(url))
+        except Exception:
+            is_valid = False
+        with self._lock:
+            self._results[url] = (is_valid, self._clock())
+            self._pending.pop(url, None)
+        return is_valid
+
+    def status(self, url):
+        """Last-known result for ``url`` (True/False, or None if never checked). Never blocks.
+
+        Missing or expired entries schedule a background re-check; an expired entry keeps
+        returning its old result until the check finishes.
+        """
+        with self._lock:
+            fresh = self._fresh(url)
+            if fresh is not None:
+                return fresh[0]
+            if url not in self._pending:
+                self._pending[url] = self._executor.submit(self._run_check, url)
+            stale = self._results.get(url)
+        return stale[0] if stale else None
+
+    def wait(self, url, timeout=None):
+        """Block until any pending check of ``url`` finishes and return the cached result."""
+        with self._lock:
+            future = self._pending.get(url)
+        if future is not None:
+            future.result(timeout=timeout)
+        with self._lock:
+            cached = self._results.get(url)
+        return cached[0] if cached else None
+
+    def invalidate(self, url=None):
+        with self._lock:
+            if url is None:
+                self._results.clear()
+            else:
+                self._results.pop(url, None)
+
+_validator = None
+_validator_lock = threading.Lock()
+
+def get_avatar_validator():
+    """Process-wide validator shared by every Streamlit session."""
+    global _validator
+    with _validator_lock:
+        if _validator is None:
+            _validator = AvatarValidator()
+        return _validator
+
+def avatar_status(url):
+    return get_avatar_validator().status(url)
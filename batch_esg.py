@@ -0,0 +1,215 @@
+"""Headless ESG scoring over a directory (or glob) of PDF reports.
+
+    python batch_esg.py reports/ -o results.jsonl
+    python batch_esg.py "reports/2025Q3/*.pdf" -o results.csv --workers 8
+    python batch_esg.py reports/ -o results.parquet   # parquet dataset directory
+
+Results are written as each report finishes. Re-running with the same output skips reports
+that are already in it, so an interrupted run resumes where it left off. Reports that failed are
+recorded with an ``error`` and are skipped too; remove their rows to retry them.
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+DIMENSIONS = ["Environmental", "Social", "Governance"]
+FIELDS = (
+    ["file", "pages"]
+    + [f"{dim.lower()}_{field}" for dim in DIMENSIONS for field in ("count", "ratio")]
+    + ["main_focus", "top_keywords", "elapsed_s", "error"]
+)
+
+def find_pdfs(source):
+    # glob 在 Linux 上區分大小寫，目錄模式先列出所有檔案再以副檔名（不分大小寫）過濾，才不會漏掉 .PDF
+    if os.path.isdir(source):
+        pattern = os.path.join(source, "**", "*")
+    else:
+        pattern = source
+    return sorted(
+        path for path in glob.glob(pattern, recursive=True)
+        if os.path.splitext(path)[1].lower() == ".pdf" and os.path.isfile(path)
+    )
+
+def score_pdf(path, json_path="esg_keywords.json", top_n=10, extract_tables=False):
+    """Worker: parse one PDF and score it; errors are reported in the row instead of raised."""
+    start = time.perf_counter()
+    row = {"file": path, "pages": 0, "error": ""}
+    try:
+        import fitz  # PyMuPDF
+        from pdf_extract import extract_text_by_page
+        from analyze_esg import load_esg_keywords, analyze_esg_text
+
+        with fitz.open(path) as doc:
+            # 批次模式下不印每頁進度，避免蓋過 CLI 的 [i/N] 進度
+            pages = extract_text_by_page(doc, max_pages=len(doc), extract_tables=extract_tables, verbose=False)
+        text = " ".join([p["content"] for p in pages])
+        results = analyze_esg_text(text, load_esg_keywords(json_path), top_n=top_n)
+
+        row["pages"] = len(pages)
+        for dim in DIMENSIONS:
+            row[f"{dim.lower()}_count"] = results[dim]["count"]
+            row[f"{dim.lower()}_ratio"] = round(results[dim]["ratio"], 6)
+        row["main_focus"] = max(results.items(), key=lambda x: x[1]["ratio"])[0]
+        row["top_keywords"] = json.dumps({dim: results[dim]["keywords"] for dim in DIMENSIONS}, ensure_ascii=False)
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    row["elapsed_s"] = round(time.perf_counter() - start, 3)
+    return row
+
+class JsonlWriter:
+    def __init__(self, path):
+        self.path = path
+
+    def done_files(self):
+        done = set()
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        done.add(os.path.abspath(json.loads(line)["file"]))
+                    except (ValueError, KeyError):
+                        pass  # 上次中斷時寫到一半的最後一行
+        return done
+
+    def open(self):
+        self._f = open(self.path, "a", encoding="utf-8")
+
+    def write(self, row):
+        self._f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+class CsvWriter:
+    def __init__(self, path):
+        self.path = path
+
+    def done_files(self):
+        done = set()
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8", newline="") as f:
+                for row in csv.DictReader(f):
+                    if row.get("file"):
+                        done.add(os.path.abspath(row["file"]))
+        return done
+
+    def open(self):
+        write_header = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        self._f = open(self.path, "a", encoding="utf-8", newline="")
+        self._writer = csv.DictWriter(self._f, fieldnames=FIELDS)
+        if write_header:
+            self._writer.writeheader()
+
+    def write(self, row):
+        self._writer.writerow(row)
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+class ParquetDatasetWriter:
+    """Writes a parquet dataset directory, one part file per ``batch_size`` finished reports."""
+
+    def __init__(self, path, batch_size=50):
+        self.path = path
+        self.batch_size = batch_size
+        self._rows = []
+
+    def _parts(self):
+        return sorted(glob.glob(os.path.join(self.path, "part-*.parquet")))
+
+    def done_files(self):
+        import pyarrow.parquet as pq
+
+        done = set()
+        for part in self._parts():
+            done.update(os.path.abspath(f) for f in pq.read_table(part, columns=["file"]).column("file").to_pylist())
+        return done
+
+    def open(self):
+        os.makedirs(self.path, exist_ok=True)
+        self._next_part = len(self._parts())
+
+    def write(self, row):
+        self._rows.append(row)
+        if len(self._rows) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not self._rows:
+            return
+        table = pa.Table.from_pylist([{field: row.get(field) for field in FIELDS} for row in self._rows])
+        part = os.path.join(self.path, f"part-{self._next_part:05d}.parquet")
+        pq.write_table(table, part + ".tmp")
+        os.replace(part + ".tmp", part)  # 只有寫完整的 part 才算完成
+        self._next_part += 1
+        self._rows = []
+
+    def close(self):
+        self._flush()
+
+def make_writer(output, parquet_batch_size=50):
+    if output.endswith(".jsonl"):
+        return JsonlWriter(output)
+    if output.endswith(".csv"):
+        return CsvWriter(output)
+    if output.endswith(".parquet"):
+        return ParquetDatasetWriter(output, batch_size=parquet_batch_size)
+    raise ValueError(f"Unsupported output format: {output} (use .jsonl, .csv or .parquet)")
+
+def run_batch(source, output, workers=None, json_path="esg_keywords.json", top_n=10,
+              extract_tables=False, parquet_batch_size=50):
+    writer = make_writer(output, parquet_batch_size)
+    pdfs = find_pdfs(source)
+    done = writer.done_files()
+    pending = [path for path in pdfs if os.path.abspath(path) not in done]
+    print(f"Found {len(pdfs)} PDF(s), {len(pdfs) - len(pending)} already done, {len(pending)} to process")
+    if not pending:
+        return 0
+
+    writer.open()
+    failed = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+            futures = [executor.submit(score_pdf, path, json_path, top_n, extract_tables) for path in pending]
+            for i, future in enumerate(as_completed(futures), 1):
+                row = future.result()
+                writer.write(row)
+                if row["error"]:
+                    failed += 1
+                    print(f"[{i}/{len(pending)}] ❌ {row['file']}: {row['error']}")
+                else:
+                    print(f"[{i}/{len(pending)}] {row['file']} -> {row['main_focus']} ({row['elapsed_s']}s)")
+    finally:
+        writer.close()
+
+    print(f"Processing complete! {len(pending) - failed} succeeded, {failed} failed")
+    return failed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch ESG keyword analysis over a directory of PDF reports.")
+    parser.add_argument("source", help="Directory (searched recursively) or glob pattern of PDF files")
+    parser.add_argument("-o", "--output", required=True, help="Output file: .jsonl, .csv or .parquet (directory)")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--keywords", default="esg_keywords.json", help="ESG keyword file")
+    parser.add_argument("--top-n", type=int, default=10, help="Top keywords kept per dimension")
+    parser.add_argument("--tables", default="off", choices=["off", "auto", "on"],
+                        help="Table extraction mode (tables rarely change keyword counts; off is fastest)")
+    parser.add_argument("--parquet-batch", type=int, default=50, help="Reports per parquet part file")
+    args = parser.parse_args(argv)
+
+    extract_tables = {"off": False, "auto": "auto", "on": True}[args.tables]
+    failed = run_batch(args.source, args.output, workers=args.workers, json_path=args.keywords,
+                       top_n=args.top_n, extract_tables=extract_tables, parquet_batch_size=args.parquet_batch)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,35 +1,312 @@
+import os
+import queue
 import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 
 DB_PATH = "db/user_profiles.db"
+POOL_SIZE = 8                 # 每個資料庫保留的連線數
+BUSY_TIMEOUT = 5              # 等待寫入鎖的秒數
+CACHED_STATEMENTS = 64        # 每條連線快取的已編譯 SQL 數量
+
+# 固定的 SQL 字串，sqlite3 會在每條連線上重用編譯好的 statement
+CREATE_PROFILES_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS user_profiles (
+        user_id TEXT PRIMARY KEY,
+        user_name TEXT NOT NULL,
+        user_image TEXT,
+        updated_at REAL NOT NULL DEFAULT ((julianday('now') - 2440587.5) * 86400.0)
+    ) WITHOUT ROWID
+'''
+CREATE_PROFILES_UPDATED_INDEX_SQL = '''
+    CREATE INDEX IF NOT EXISTS idx_user_profiles_updated_at ON user_profiles (updated_at)
+'''
+UPSERT_PROFILE_SQL = '''
+    INSERT INTO user_profiles (user_id, user_name, user_image, updated_at)
+    VALUES (?, ?, ?, (julianday('now') - 2440587.5) * 86400.0)
+    ON CONFLICT (user_id) DO UPDATE SET
+        user_name = excluded.user_name,
+        user_image = excluded.user_image,
+        updated_at = excluded.updated_at
+'''
+SELECT_PROFILE_SQL = 'SELECT user_name, user_image FROM user_profiles WHERE user_id = ?'
+
+# 舊版只有一筆全域資料的 user_profile 表，第一次啟動時搬到 LEGACY_USER_ID 底下
+LEGACY_USER_ID = "default"
+LEGACY_TABLE_EXISTS_SQL = "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_profile'"
+MIGRATE_LEGACY_PROFILE_SQL = '''
+    INSERT OR IGNORE INTO user_profiles (user_id, user_name, user_image)
+    SELECT ?, user_name, user_image FROM user_profile ORDER BY id DESC LIMIT 1
+'''
+DROP_LEGACY_TABLE_SQL = 'DROP TABLE user_profile'
+# LEGACY_USER_ID 只讀：新使用者第一次進來時複製一份成自己的資料
+COPY_LEGACY_PROFILE_SQL = '''
+    INSERT INTO user_profiles (user_id, user_name, user_image, updated_at)
+    SELECT ?, user_name, user_image, (julianday('now') - 2440587.5) * 86400.0
+    FROM user_profiles WHERE user_id = ?
+    ON CONFLICT (user_id) DO NOTHING
+'''
+
+# 聊天紀錄只新增不修改，(user_id, id) 索引讓「最近 N 筆」與往前翻頁都走索引
+CREATE_CHAT_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS chat_messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT NOT NULL,
+        image TEXT,
+        created_at REAL NOT NULL DEFAULT ((julianday('now') - 2440587.5) * 86400.0)
+    )
+'''
+CREATE_CHAT_INDEX_SQL = '''
+    CREATE INDEX IF NOT EXISTS idx_chat_messages_user_id ON chat_messages (user_id, id)
+'''
+INSERT_CHAT_MESSAGE_SQL = 'INSERT INTO chat_messages (user_id, role, content, image) VALUES (?, ?, ?, ?)'
+SELECT_RECENT_CHAT_SQL = '''
+    SELECT id, role, content, image FROM chat_messages
+    WHERE user_id = ? ORDER BY id DESC LIMIT ?
+'''
+SELECT_OLDER_CHAT_SQL = '''
+    SELECT id, role, content, image FROM chat_messages
+    WHERE user_id = ? AND id < ? ORDER BY id DESC LIMIT ?
+'''
+CHAT_PAGE_SIZE = 20
+
+MAX_CACHED_PROFILES = 10_000  # 行程內最多快取幾位使用者的資料
+
+class ConnectionPool:
+    """Long-lived SQLite connections in WAL mode, shared across Streamlit sessions and threads."""
+
+    def __init__(self, db_path, size=POOL_SIZE):
+        self.db_path = db_path
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def _connect(self):
+        # 資料庫是執行期產生的檔案（不在版本控制中），第一次啟動時建立
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT, check_same_thread=False,
+                               cached_statements=CACHED_STATEMENTS)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; commits on success, rolls back on error."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            with conn:
+                yield conn
+        finally:
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+_pools = {}
+_initialized = set()
+_lock = threading.Lock()
+_init_lock = threading.Lock()
+_profile_cache = OrderedDict()  # (db_path, user_id) -> profile dict or None (LRU)
+_profile_version = {}           # (db_path, user_id) -> 寫入次數，避免讀到一半被寫入時快取舊資料
+
+def get_pool(db_path=None):
+    db_path = db_path or DB_PATH
+    with _lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = _pools[db_path] = ConnectionPool(db_path)
+        return pool
+
+def _migrate_legacy_profile(conn):
+    if conn.execute(LEGACY_TABLE_EXISTS_SQL).fetchone() is None:
+        return
+    conn.execute(MIGRATE_LEGACY_PROFILE_SQL, (LEGACY_USER_ID,))
+    conn.execute(DROP_LEGACY_TABLE_SQL)
+    print(f"🗃️ Migrated legacy user_profile table to user_profiles (user_id={LEGACY_USER_ID!r})")
 
 def init_db():
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_profile (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_name TEXT NOT NULL,
-                user_image TEXT
-            )
-        ''')
-        conn.commit()
-
-def save_user_profile(user_name, user_image):
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM user_profile')  # 確保只有一筆
-        cursor.execute('''
-            INSERT INTO user_profile (user_name, user_image)
-            VALUES (?, ?)
-        ''', (user_name, user_image))
-        conn.commit()
-
-def get_user_profile():
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.cursor()
-        cursor.execute('SELECT user_name, user_image FROM user_profile LIMIT 1')
-        row = cursor.fetchone()
-        if row:
-            return {"user_name": row[0], "user_image": row[1]}
+    """Create the schema (and migrate the old single-profile table) once per process."""
+    db_path = DB_PATH
+    if db_path in _initialized:
+        return
+    with _init_lock:
+        if db_path in _initialized:
+            return
+        with get_pool(db_path).connection() as conn:
+            conn.execute(CREATE_PROFILES_TABLE_SQL)
+            conn.execute(CREATE_PROFILES_UPDATED_INDEX_SQL)
+            conn.execute(CREATE_CHAT_TABLE_SQL)
+            conn.execute(CREATE_CHAT_INDEX_SQL)
+            _migrate_legacy_profile(conn)
+        _initialized.add(db_path)
+
+def _invalidate_profiles(db_path, user_ids):
+    with _lock:
+        for user_id in user_ids:
+            key = (db_path, user_id)
+            _profile_cache.pop(key, None)
+            _profile_version[key] = _profile_version.get(key, 0) + 1
+
+def save_user_profiles(profiles):
+    """Upsert many ``(user_id, user_name, user_image)`` rows in one transaction.
+
+    LEGACY_USER_ID is reserved (it seeds every new user) and cannot be written here.
+    """
+    db_path = DB_PATH
+    profiles = list(profiles)
+    if not profiles:
+        return
+    if any(row[0] == LEGACY_USER_ID for row in profiles):
+        raise ValueError(f"user_id {LEGACY_USER_ID!r} is reserved for the migrated default profile")
+    with get_pool(db_path).connection() as conn:
+        conn.executemany(UPSERT_PROFILE_SQL, profiles)
+    _invalidate_profiles(db_path, {row[0] for row in profiles})
+
+def save_user_profile(user_id, user_name, user_image):
+    save_user_profiles([(user_id, user_name, user_image)])
+
+def get_user_profile(user_id):
+    """Read-through cached profile of ``user_id``; saves invalidate that user's entry."""
+    db_path = DB_PATH
+    key = (db_path, user_id)
+    with _lock:
+        if key in _profile_cache:
+            _profile_cache.move_to_end(key)
+            profile = _profile_cache[key]
+            return dict(profile) if profile else None
+        version = _profile_version.get(key, 0)
+    with get_pool(db_path).connection() as conn:
+        row = conn.execute(SELECT_PROFILE_SQL, (user_id,)).fetchone()
+    profile = {"user_name": row[0], "user_image": row[1]} if row else None
+    with _lock:
+        if _profile_version.get(key, 0) == version:
+            _profile_cache[key] = profile
+            while len(_profile_cache) > MAX_CACHED_PROFILES:
+                _profile_cache.popitem(last=False)
+    return dict(profile) if profile else None
+
+def get_or_create_user_profile(user_id):
+    """Profile of ``user_id``; a user without one gets a copy of the migrated default profile.
+
+    The copy is made once, so later changes are the user's own and the default stays untouched.
+    """
+    profile = get_user_profile(user_id)
+    if profile is not None or user_id == LEGACY_USER_ID:
+        return profile
+    db_path = DB_PATH
+    with get_pool(db_path).connection() as conn:
+        copied = conn.execute(COPY_LEGACY_PROFILE_SQL, (user_id, LEGACY_USER_ID)).rowcount
+    if not copied:
+        return None
+    _invalidate_profiles(db_path, {user_id})
+    return get_user_profile(user_id)
+
+def append_chat_message(user_id, role, content, image=None):
+    """Append one message to the chat log and return it with its id."""
+    with get_pool().connection() as conn:
+        message_id = conn.execute(INSERT_CHAT_MESSAGE_SQL, (user_id, role, content, image)).lastrowid
+    message = {"id": message_id, "role": role, "content": content}
+    if image:
+        message["image"] = image
+    return message
+
+def get_chat_messages(user_id, before_id=None, limit=CHAT_PAGE_SIZE):
+    """Up to ``limit`` messages older than ``before_id`` (newest page if None), oldest first.
+
+    Returns ``(messages, has_older)``.
+    """
+    with get_pool().connection() as conn:
+        if before_id is None:
+            rows = conn.execute(SELECT_RECENT_CHAT_SQL, (user_id, limit + 1)).fetchall()
         else:
-            return None
\ No newline at end of file
+            rows = conn.execute(SELECT_OLDER_CHAT_SQL, (user_id, before_id, limit + 1)).fetchall()
+    has_older = len(rows) > limit
+    messages = []
+    for message_id, role, content, image in reversed(rows[:limit]):
+        message = {"id": message_id, "role": role, "content": content}
+        if image:
+            message["image"] = image
+        messages.append(message)
+    return messages, has_older
+
+def _naive_get_user_profile(db_path, user_id):
+    # 舊版做法：每次都重新開連線，只給 benchmark 比較用
+    with sqlite3.connect(db_path) as conn:
+        row = conn.execute(SELECT_PROFILE_SQL, (user_id,)).fetchone()
+        return {"user_name": row[0], "user_image": row[1]} if row else None
+
+def benchmark(sessions=32, reads_per_session=200, writes_every=0, users=1000):
+    """Time profile reads from ``sessions`` concurrent threads over ``users`` profiles, naive vs pooled+cached."""
+    import random
+    import tempfile
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    global DB_PATH
+    original_path = DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        DB_PATH = os.path.join(tmp, "bench.db")
+        try:
+            init_db()
+            user_ids = [f"user-{i}" for i in range(users)]
+            start = time.perf_counter()
+            save_user_profiles((uid, uid, "https://www.w3schools.com/howto/img_avatar.png") for uid in user_ids)
+            print(f"upsert  {users} profiles in one batch: {time.perf_counter() - start:.3f}s")
+
+            def naive_session(session_id):
+                rng = random.Random(session_id)
+                for _ in range(reads_per_session):
+                    _naive_get_user_profile(DB_PATH, rng.choice(user_ids))
+
+            def pooled_session(session_id):
+                rng = random.Random(session_id)
+                for i in range(reads_per_session):
+                    user_id = rng.choice(user_ids)
+                    if writes_every and i % writes_every == 0:
+                        save_user_profile(user_id, user_id, f"https://example.com/{i}.png")
+                    init_db()
+                    get_user_profile(user_id)
+
+            results = {}
+            for name, fn in (("naive", naive_session), ("pooled", pooled_session)):
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=sessions) as pool:
+                    list(pool.map(fn, range(sessions)))
+                elapsed = time.perf_counter() - start
+                total = sessions * reads_per_session
+                results[name] = {"seconds": elapsed, "reads_per_s": total / elapsed}
+                print(f"{name:<7} {sessions} sessions x {reads_per_session} reads: "
+                      f"{elapsed:.3f}s ({total / elapsed:,.0f} reads/s)")
+            return results
+        finally:
+            get_pool(DB_PATH).close()
+            with _lock:
+                _pools.pop(DB_PATH, None)
+                _initialized.discard(DB_PATH)
+                for key in [k for k in _profile_cache if k[0] == DB_PATH]:
+                    del _profile_cache[key]
+            DB_PATH = original_path
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark concurrent profile reads.")
+    parser.add_argument("--sessions", type=int, default=32)
+    parser.add_argument("--reads", type=int, default=200)
+    parser.add_argument("--writes-every", type=int, default=0,
+                        help="Each session saves a profile every N reads (0 = read only).")
+    parser.add_argument("--users", type=int, default=1000)
+    args = parser.parse_args()
+    benchmark(args.sessions, args.reads, args.writes_every, args.users)
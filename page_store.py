@@ -0,0 +1,177 @@
+import json
+import mmap
+import sys
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+
+class PageStore:
+    """Parsed pages of one document kept in a single contiguous UTF-8 buffer with offset arrays.
+
+    Iterating yields the same {"page", "content"} dicts as extract_text_by_page (decoded on the
+    fly), so code written against the plain list keeps working. Pages must be appended in page
+    order. The buffer may be a read-only mmap of a parse-cache file, shared by every session that
+    opened the same report; it is copied into memory only if more pages are appended.
+    """
+
+    def __init__(self, pages=()):
+        # page i 的內容是 buffer[offsets[i]:offsets[i+1]-1]，每頁之後接一個空白
+        self._buffer = bytearray()
+        self._offsets = array("Q", [0])
+        self._numbers = array("I")
+        self._index = {}
+        self._pending = set()
+        self._overrides = {}
+        self._revisions = []  # update_content 改過的頁碼，依序記錄（只增不減）
+        self._version = 0     # 每次 append / update_content 加一，memo 只在版本沒變時寫回
+        self._full_text = None
+        self._plain_text = None
+        self._lock = threading.Lock()
+        for entry in pages:
+            self.append(entry)
+
+    @classmethod
+    def load(cls, buffer_path, index_path, use_mmap=True):
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        with open(buffer_path, "rb") as f:
+            if use_mmap and index["offsets"][-1] > 0:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                buffer = f.read()
+
+        store = cls()
+        store._buffer = buffer
+        store._offsets = array("Q", index["offsets"])
+        store._numbers = array("I", index["pages"])
+        store._index = {number: i for i, number in enumerate(index["pages"])}
+        store._pending = set(index.get("tables_pending", []))
+        return store
+
+    def save(self, buffer_path, index_path):
+        # 有 on-demand 補抽的內容時先重建成一份連續的 buffer
+        store = PageStore(self) if self._overrides else self
+        with open(buffer_path, "wb") as f:
+            f.write(store._buffer[:store._offsets[-1]])
+        with open(index_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "pages": list(store._numbers),
+                "offsets": list(store._offsets),
+                "tables_pending": sorted(store._pending),
+            }, f)
+
+    def append(self, entry):
+        with self._lock:
+            if not isinstance(self._buffer, bytearray):
+                self._buffer = bytearray(self._buffer)
+            self._buffer += entry["content"].encode("utf-8") + b" "
+            self._offsets.append(len(self._buffer))
+            if entry.get("tables_pending"):
+                self._pending.add(entry["page"])
+            self._index[entry["page"]] = len(self._numbers)
+            self._numbers.append(entry["page"])
+            self._version += 1
+            self._full_text = None
+            self._plain_text = None
+
+    def _entry(self, i):
+        number = self._numbers[i]
+        content = self._overrides.get(number)
+        if content is None:
+            content = self._buffer[self._offsets[i]:self._offsets[i + 1] - 1].decode("utf-8")
+        entry = {"page": number, "content": content}
+        if number in self._pending:
+            entry["tables_pending"] = True
+        return entry
+
+    def __len__(self):
+        return len(self._numbers)
+
+    def __iter__(self):
+        return self.iter_from(0)
+
+    def iter_from(self, position):
+        """Entries from the ``position``-th stored page on; pages are only ever appended."""
+        return (self._entry(i) for i in range(position, len(self._numbers)))
+
+    def revisions_since(self, position):
+        """(page numbers changed by update_content after the first ``position`` changes, new position)."""
+        with self._lock:
+            return self._revisions[position:], len(self._revisions)
+
+    def get(self, page_number):
+        i = self._index.get(page_number)
+        return None if i is None else self._entry(i)
+
+    def update_content(self, page_number, content):
+        with self._lock:
+            self._overrides[page_number] = content
+            self._revisions.append(page_number)
+            self._pending.discard(page_number)
+            self._version += 1
+            self._full_text = None
+            self._plain_text = None
+
+    def page_range(self, start, end):
+        """Pages with start <= page <= end (inclusive, like the page numbers users type)."""
+        lo = bisect_left(self._numbers, start)
+        hi = bisect_right(self._numbers, end)
+        return [self._entry(i) for i in range(lo, hi)]
+
+    def range_text(self, start, end):
+        return "\n\n".join([f"[Page {p['page']}]: {p['content']}" for p in self.page_range(start, end)])
+
+    def full_text(self):
+        """"[Page n]: ..." view of every page, built once and reused until pages change."""
+        with self._lock:
+            text, version, count = self._full_text, self._version, len(self._numbers)
+        if text is None:
+            text = "\n\n".join([f"[Page {p['page']}]: {p['content']}" for p in self._iter_until(count)])
+            self._store_memo("_full_text", text, version)
+        return text
+
+    def plain_text(self):
+        """Page contents joined by spaces (what the ESG analysis scores)."""
+        with self._lock:
+            text, version, count = self._plain_text, self._version, len(self._numbers)
+            end = self._offsets[-1]
+            has_overrides = bool(self._overrides)
+        if text is None:
+            if has_overrides:
+                text = " ".join([p["content"] for p in self._iter_until(count)])
+            else:
+                # buffer 本身就是以空白串接的全文，只需去掉最後一個空白
+                text = self._buffer[:max(end, 1) - 1].decode("utf-8")
+            self._store_memo("_plain_text", text, version)
+        return text
+
+    def _iter_until(self, count):
+        return (self._entry(i) for i in range(count))
+
+    def _store_memo(self, name, text, version):
+        # 組字串時 ingestion thread 可能又 append 了頁面；版本變了就不快取這份過時的結果
+        with self._lock:
+            if self._version == version:
+                setattr(self, name, text)
+
+    def char_window(self, start, length):
+        return self.full_text()[start:start + length]
+
+    def memory_footprint(self):
+        """Approximate bytes held by this store; a mapped buffer lives in the shared page cache."""
+        mapped = isinstance(self._buffer, mmap.mmap)
+        buffer_bytes = len(self._buffer)
+        index_bytes = (
+            self._offsets.itemsize * len(self._offsets)
+            + self._numbers.itemsize * len(self._numbers)
+            + sys.getsizeof(self._index)
+        )
+        memo_bytes = sum(sys.getsizeof(t) for t in (self._full_text, self._plain_text) if t is not None)
+        memo_bytes += sum(sys.getsizeof(t) for t in self._overrides.values())
+        return {
+            "buffer": buffer_bytes,
+            "mapped": mapped,
+            "index": index_bytes,
+            "memo": memo_bytes,
+            "resident": (0 if mapped else buffer_bytes) + index_bytes + memo_bytes,
+        }
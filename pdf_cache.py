@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from page_store import PageStore
+
+CACHE_DB_PATH = "db/pdf_cache.db"
+CACHE_DIR = "db/pdf_cache"
+MAX_CACHE_BYTES = 512 * 1024 * 1024  # 快取總容量上限，超過時依 LRU 淘汰
+SOURCE_KEY_PREFIX = "src-"           # 原始 PDF 也存在快取中，以內容雜湊為 key
+
+def make_cache_key(pdf_bytes, max_pages, skip_pages=(), extract_tables=True):
+    """Hash of the PDF bytes plus the extraction options that affect the parsed result."""
+    options = json.dumps({
+        "max_pages": max_pages,
+        "skip_pages": sorted(set(skip_pages)),
+        "extract_tables": extract_tables,
+    }, sort_keys=True)
+    h = hashlib.sha256(pdf_bytes)
+    h.update(options.encode("utf-8"))
+    return h.hexdigest()
+
+def _payload_paths(key):
+    """(UTF-8 text buffer, page offset index) files for one cache entry."""
+    return os.path.join(CACHE_DIR, f"{key}.bin"), os.path.join(CACHE_DIR, f"{key}.idx.json")
+
+def _entry_paths(key):
+    """Every file that belongs to a cache entry (parsed pages or a source PDF)."""
+    if key.startswith(SOURCE_KEY_PREFIX):
+        return (os.path.join(CACHE_DIR, f"{key}.pdf"),)
+    return _payload_paths(key)
+
+def init_cache():
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with sqlite3.connect(CACHE_DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS pdf_cache (
+                cache_key TEXT PRIMARY KEY,
+                size_bytes INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_pdf_cache_last_access ON pdf_cache (last_access)')
+        conn.commit()
+
+def get_cached_pages(key, use_mmap=True):
+    """Return the cached pages for ``key`` as a (memory-mapped) PageStore, or None on a miss."""
+    init_cache()
+    buffer_path, index_path = _payload_paths(key)
+    with sqlite3.connect(CACHE_DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT 1 FROM pdf_cache WHERE cache_key = ?', (key,))
+        if cursor.fetchone() is None:
+            return None
+        try:
+            pages = PageStore.load(buffer_path, index_path, use_mmap=use_mmap)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"(get_cached_pages) Dropping unreadable cache entry {key}: {e}")
+            cursor.execute('DELETE FROM pdf_cache WHERE cache_key = ?', (key,))
+            conn.commit()
+            return None
+        cursor.execute('UPDATE pdf_cache SET last_access = ? WHERE cache_key = ?', (time.time(), key))
+        conn.commit()
+    return pages
+
+def save_cached_pages(key, pages, max_bytes=MAX_CACHE_BYTES):
+    init_cache()
+    store = pages if isinstance(pages, PageStore) else PageStore(pages)
+    buffer_path, index_path = _payload_paths(key)
+    tmp_suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+    store.save(buffer_path + tmp_suffix, index_path + tmp_suffix)
+    # 先寫暫存檔再替換，避免其他 session 讀到一半的檔案
+    try:
+        os.replace(buffer_path + tmp_suffix, buffer_path)
+        os.replace(index_path + tmp_suffix, index_path)
+    except OSError as e:
+        # Windows 上正被 mmap 的檔案無法替換；內容相同，保留舊檔即可
+        print(f"(save_cached_pages) Keeping existing cache files for {key}: {e}")
+        for path in (buffer_path + tmp_suffix, index_path + tmp_suffix):
+            if os.path.exists(path):
+                os.remove(path)
+
+    with sqlite3.connect(CACHE_DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR REPLACE INTO pdf_cache (cache_key, size_bytes, last_access)
+            VALUES (?, ?, ?)
+        ''', (key, os.path.getsize(buffer_path) + os.path.getsize(index_path), time.time()))
+        conn.commit()
+
+    evict_cache(max_bytes)
+
+def evict_cache(max_bytes=MAX_CACHE_BYTES):
+    """Delete least recently used entries until the cache fits in ``max_bytes``."""
+    with sqlite3.connect(CACHE_DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT COALESCE(SUM(size_bytes), 0) FROM pdf_cache')
+        total = cursor.fetchone()[0]
+        if total <= max_bytes:
+            return
+
+        cursor.execute('SELECT cache_key, size_bytes FROM pdf_cache ORDER BY last_access ASC')
+        evicted = []
+        for key, size in cursor.fetchall():
+            if total <= max_bytes:
+                break
+            evicted.append(key)
+            total -= size
+
+        cursor.executemany('DELETE FROM pdf_cache WHERE cache_key = ?', [(key,) for key in evicted])
+        conn.commit()
+
+    for key in evicted:
+        for path in _entry_paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    print(f"(evict_cache) Evicted {len(evicted)} cached PDF(s)")
+
+def save_source_pdf(pdf_bytes, max_bytes=MAX_CACHE_BYTES):
+    """Keep the uploaded PDF on disk under its content hash so sessions need not hold the bytes.
+
+    Returns the source key for source_pdf_path(); the file takes part in the same LRU eviction.
+    """
+    init_cache()
+    key = SOURCE_KEY_PREFIX + hashlib.sha256(pdf_bytes).hexdigest()
+    (path,) = _entry_paths(key)
+    if not os.path.exists(path):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(pdf_bytes)
+        os.replace(tmp_path, path)
+
+    with sqlite3.connect(CACHE_DB_PATH) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT OR REPLACE INTO pdf_cache (cache_key, size_bytes, last_access)
+            VALUES (?, ?, ?)
+        ''', (key, len(pdf_bytes), time.time()))
+        conn.commit()
+
+    evict_cache(max_bytes)
+    return key
+
+def source_pdf_path(key):
+    """Path of a PDF saved by save_source_pdf, or None if it has been evicted."""
+    (path,) = _entry_paths(key)
+    if not os.path.exists(path):
+        return None
+    with sqlite3.connect(CACHE_DB_PATH) as conn:
+        conn.execute('UPDATE pdf_cache SET last_access = ? WHERE cache_key = ?', (time.time(), key))
+    return path
@@ -1,59 +1,54 @@
 import streamlit as st
-import re
-
-def clean_text(text):
-    text = re.sub(r'\s+', ' ', text)
-    text = re.sub(r'-\s+', '', text)
-    text = re.sub(r'<[^>]+>', '', text)
-    return text.strip()
-
-def extract_text_by_page(doc, max_pages=40, skip_pages=[]):
-    formatted_full_text = []
-    total_items = len(doc)
-    total_pages = min(len(doc), max_pages)
-
-    for page_number, page in enumerate(doc):
-        if page_number >= max_pages:
-            break
-        if int(page_number) + 1 in skip_pages:
-            print(f"Skip page {page_number+1}")
-            continue
-
-        try:
-            this_text = clean_text(page.get_text())
-
-            # Extract tables
-            tables = page.find_tables()
-            for table in tables:
-                df = table.to_pandas()
-                this_text += "\nTable:\n" + df.to_string() + "\n"
-            print(f"Text length in page {page_number+1}: {len(this_text)}")
-
-            formatted_full_text.append({
-                "page": page_number + 1,
-                "content": this_text
-            })
-
-            # Update progress
-            progress = (page_number + 1) / total_pages
-            print(f"Progress: {round(progress*100)}%")
-            print(f"Processing {page_number + 1}/{total_pages} pages with document (max_pages:{max_pages})...")
-
-        except Exception as e:
-            print(f"(extract_text_by_page) Error processing page {page}: {e}")
-
-    print("Processing complete!")
-
-    return formatted_full_text
+from page_store import PageStore
+from pdf_cache import source_pdf_path
+from pdf_extract import *
+from pdf_extract import _extract_tables
+
+def _fill_pending_tables(store, p):
+    """On-demand table extraction for a page skipped by the "auto" pre-check.
+
+    The PDF is re-read from the parse cache (by content hash) rather than kept in the session.
+    """
+    source_key = st.session_state.get("pdf_source")
+    if not p.get("tables_pending") or source_key is None:
+        return p
+    source_path = source_pdf_path(source_key)
+    if source_path is None:
+        return p
+
+    import fitz  # PyMuPDF
+
+    tables = ""
+    try:
+        with fitz.open(source_path) as doc:
+            tables = _extract_tables(doc[p["page"] - 1])
+    except Exception as e:
+        print(f"(_fill_pending_tables) Error processing page {p['page']}: {e}")
+    store.update_content(p["page"], p["content"] + tables)
+    return store.get(p["page"])
+
+def get_page_store():
+    """The PageStore for the uploaded PDF, or None if nothing has been uploaded."""
+    pages = st.session_state.get("pdf_text")
+    if pages is None or isinstance(pages, PageStore):
+        return pages
+    store = PageStore(pages)
+    st.session_state["pdf_text"] = store
+    return store
 
 def get_pdf_context(page="all") -> str:
-    if "pdf_text" not in st.session_state:
+    store = get_page_store()
+    if store is None:
         return ""
 
     if page != "all":
-        for p in st.session_state["pdf_text"]:
-            if p["page"] == page:
-                return f"[Page {p['page']}]: {p['content']}"
+        p = store.get(page)
+        if p is not None:
+            p = _fill_pending_tables(store, p)
+            return f"[Page {p['page']}]: {p['content']}"
+        job = st.session_state.get("pdf_job")
+        if job and not job["done"]:
+            return f"⏳ Page {page} is still being parsed ({len(job['pages'])}/{job['total']} pages ready). Please try again shortly."
         return f"Page {page} not found in the PDF."
 
-    return "\n\n".join([f"[Page {p['page']}]: {p['content']}" for p in st.session_state["pdf_text"]])
\ No newline at end of file
+    return store.full_text()
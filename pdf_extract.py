@@ -0,0 +1,229 @@
+"""Page text/table extraction with PyMuPDF, serial or over a process pool.
+
+Kept free of Streamlit so pool workers (and batch_esg) don't import it.
+"""
+import re
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pool_utils import pool_context
+
+# "auto": 先只抽文字，只有疑似含表格的頁面才跑 find_tables
+DEFAULT_TABLE_MODE = "auto"
+# 頁面上至少要有這麼多條線段/矩形才視為可能有表格
+TABLE_MIN_RULINGS = 4
+# 頁數少於此值時直接在目前的執行緒逐頁解析，啟動 process pool 的成本比解析本身還高
+PARALLEL_MIN_PAGES = 16
+
+def clean_text(text):
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'-\s+', '', text)
+    text = re.sub(r'<[^>]+>', '', text)
+    return text.strip()
+
+def _likely_has_tables(page):
+    """Cheap pre-check: find_tables() detects tables from ruling lines, so pages without any can be skipped."""
+    get_drawings = getattr(page, "get_cdrawings", page.get_drawings)
+    rulings = 0
+    for path in get_drawings():
+        for item in path.get("items", []):
+            if item[0] in ("l", "re", "qu"):
+                rulings += 1
+                if rulings >= TABLE_MIN_RULINGS:
+                    return True
+    return False
+
+def _extract_tables(page):
+    text = ""
+    for table in page.find_tables():
+        df = table.to_pandas()
+        text += "\nTable:\n" + df.to_string() + "\n"
+    return text
+
+def _extract_page(page, page_number, extract_tables=True):
+    """Return ({"page", "content"[, "tables_pending"]}, timing) for one page."""
+    start = time.perf_counter()
+    this_text = clean_text(page.get_text())
+    text_done = time.perf_counter()
+
+    if extract_tables == "auto":
+        run_tables = _likely_has_tables(page)
+    else:
+        run_tables = bool(extract_tables)
+
+    # Extract tables
+    if run_tables:
+        this_text += _extract_tables(page)
+    tables_done = time.perf_counter()
+
+    entry = {
+        "page": page_number + 1,
+        "content": this_text
+    }
+    if extract_tables == "auto":
+        # 未偵測的頁面留待 get_pdf_context(page=n) 時再補抽表格
+        entry["tables_pending"] = not run_tables
+
+    timing = {
+        "page": page_number + 1,
+        "text_ms": round((text_done - start) * 1000, 2),
+        "tables_ms": round((tables_done - text_done) * 1000, 2),
+        "tables_checked": run_tables
+    }
+    return entry, timing
+
+# 每個 worker 行程只收一次 pdf bytes，並只開啟一次文件
+_worker_pdf_bytes = None
+_worker_doc = None
+
+def _init_pdf_worker(pdf_bytes):
+    global _worker_pdf_bytes, _worker_doc
+    _worker_pdf_bytes = pdf_bytes
+    _worker_doc = None
+
+def _worker_document():
+    global _worker_doc
+    if _worker_doc is None:
+        import fitz  # PyMuPDF
+        _worker_doc = fitz.open(stream=_worker_pdf_bytes, filetype="pdf")
+    return _worker_doc
+
+def _extract_page_range(start, end, skip_pages, extract_tables=True):
+    """Worker: extract pages [start, end) from the document handed over by _init_pdf_worker."""
+    results = []
+    timings = []
+    doc = _worker_document()
+    for page_number in range(start, end):
+        if page_number + 1 in skip_pages:
+            continue
+        try:
+            entry, timing = _extract_page(doc[page_number], page_number, extract_tables)
+            results.append(entry)
+            timings.append(timing)
+        except Exception as e:
+            print(f"(_extract_page_range) Error processing page {page_number+1}: {e}")
+    return results, timings
+
+def report_timings(timings):
+    if not timings:
+        return
+    text_ms = sum(t["text_ms"] for t in timings)
+    tables_ms = sum(t["tables_ms"] for t in timings)
+    checked = sum(1 for t in timings if t["tables_checked"])
+    print(f"Timings: text {text_ms:.0f} ms, tables {tables_ms:.0f} ms "
+          f"({checked}/{len(timings)} pages checked for tables)")
+
+def iter_text_parallel(pdf_bytes, total_pages, max_pages=40, skip_pages=[], workers=None, shard_size=None,
+                       extract_tables=True, timings=None, verbose=True):
+    """Generator version of extract_text_parallel: yields pages in order as soon as their shard finishes.
+
+    Only ``workers * 2`` shards are in flight at a time, so memory stays bounded on very large documents.
+    Documents under ``PARALLEL_MIN_PAGES`` pages (or ``workers=1``) are parsed serially in the caller.
+    ``verbose=False`` silences the progress lines (errors are still printed).
+    """
+    total_pages = min(total_pages, max_pages)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or total_pages < PARALLEL_MIN_PAGES:
+        import fitz  # PyMuPDF
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+            yield from iter_text_by_page(doc, max_pages=total_pages, skip_pages=skip_pages, workers=1,
+                                         extract_tables=extract_tables, timings=timings, verbose=verbose)
+        return
+
+    # 每個 worker 分到多個小區段，避免某一段特別慢時其他 core 閒置
+    shard_size = shard_size or max(1, -(-total_pages // (workers * 4)))
+    shards = iter([(start, min(start + shard_size, total_pages)) for start in range(0, total_pages, shard_size)])
+    skip_pages = set(skip_pages)
+    timings = timings if timings is not None else []
+
+    # pdf bytes 透過 initializer 每個 worker 傳一次，各 shard 只送頁碼範圍
+    with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context(),
+                             initializer=_init_pdf_worker, initargs=(pdf_bytes,)) as executor:
+        pending = deque()
+
+        def submit_next():
+            shard = next(shards, None)
+            if shard is not None:
+                start, end = shard
+                pending.append((end, executor.submit(_extract_page_range, start, end,
+                                                     skip_pages, extract_tables)))
+
+        for _ in range(workers * 2):
+            submit_next()
+
+        # 依照送出的順序收集結果，確保頁碼順序不變
+        while pending:
+            end, future = pending.popleft()
+            pages, shard_timings = future.result()
+            submit_next()
+            timings.extend(shard_timings)
+            if verbose:
+                print(f"Progress: {round(end / total_pages * 100)}%")
+                print(f"Processing {end}/{total_pages} pages with {workers} workers (max_pages:{max_pages})...")
+            yield from pages
+
+def extract_text_parallel(pdf_bytes, total_pages, max_pages=40, skip_pages=[], workers=None, shard_size=None,
+                          extract_tables=True, timings=None, verbose=True):
+    """Shard page ranges across a process pool and merge the results in page order."""
+    timings = timings if timings is not None else []
+    formatted_full_text = list(iter_text_parallel(pdf_bytes, total_pages, max_pages=max_pages,
+                                                  skip_pages=skip_pages, workers=workers, shard_size=shard_size,
+                                                  extract_tables=extract_tables, timings=timings,
+                                                  verbose=verbose))
+    if verbose:
+        report_timings(timings)
+        print("Processing complete!")
+
+    return formatted_full_text
+
+def iter_text_by_page(doc, max_pages=40, skip_pages=[], workers=1, extract_tables=True, timings=None,
+                      verbose=True):
+    """Yield {"page", "content"} dicts one page at a time as they finish parsing."""
+    total_items = len(doc)
+    total_pages = min(len(doc), max_pages)
+    timings = timings if timings is not None else []
+
+    if workers != 1 and total_pages >= PARALLEL_MIN_PAGES:
+        yield from iter_text_parallel(doc.tobytes(), total_items, max_pages=max_pages, skip_pages=skip_pages,
+                                      workers=workers, extract_tables=extract_tables, timings=timings,
+                                      verbose=verbose)
+        return
+
+    for page_number, page in enumerate(doc):
+        if page_number >= max_pages:
+            break
+        if int(page_number) + 1 in skip_pages:
+            if verbose:
+                print(f"Skip page {page_number+1}")
+            continue
+
+        try:
+            entry, timing = _extract_page(page, page_number, extract_tables)
+            timings.append(timing)
+
+            if verbose:
+                print(f"Text length in page {page_number+1}: {len(entry['content'])} "
+                      f"(text {timing['text_ms']} ms, tables {timing['tables_ms']} ms)")
+
+                # Update progress
+                progress = (page_number + 1) / total_pages
+                print(f"Progress: {round(progress*100)}%")
+                print(f"Processing {page_number + 1}/{total_pages} pages with document (max_pages:{max_pages})...")
+
+        except Exception as e:
+            print(f"(extract_text_by_page) Error processing page {page}: {e}")
+            continue
+
+        yield entry
+
+def extract_text_by_page(doc, max_pages=40, skip_pages=[], workers=1, extract_tables=True, timings=None,
+                         verbose=True):
+    timings = timings if timings is not None else []
+    formatted_full_text = list(iter_text_by_page(doc, max_pages=max_pages, skip_pages=skip_pages, workers=workers,
+                                                 extract_tables=extract_tables, timings=timings, verbose=verbose))
+    if verbose:
+        report_timings(timings)
+        print("Processing complete!")
+
+    return formatted_full_text
@@ -0,0 +1,8 @@
+import multiprocessing
+
+# process pool 可能從 Streamlit 的執行緒啟動，不用 fork 以免子行程繼承被鎖住的 lock
+POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+def pool_context():
+    """multiprocessing context for ProcessPoolExecutor(mp_context=...) in the app's pools."""
+    return multiprocessing.get_context(POOL_START_METHOD)
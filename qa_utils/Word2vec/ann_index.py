@@ -0,0 +1,184 @@
+import threading
+import time
+import weakref
+import numpy as np
+
+# 字彙量低於此值時直接用 gensim 的精確 most_similar 就夠快
+ANN_MIN_VOCAB = 20000
+DEFAULT_N_PROBE = 8
+
+_INDEX_CACHE = weakref.WeakKeyDictionary()
+_INDEX_CACHE_LOCK = threading.Lock()
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+class IVFIndex:
+    """Pure-NumPy inverted-file index for approximate cosine top-k search.
+
+    Vectors are clustered with spherical k-means into ``n_lists`` lists; a query only scores the
+    vectors of its ``n_probe`` closest lists. The index keeps no copy of the vectors: only the
+    row order grouped by list, list offsets and per-row inverse norms, so a memory-mapped matrix
+    stays shared between processes and each probe normalises just the rows it reads.
+    """
+
+    # 分派向量到中心時每次處理的列數，限制暫存的正規化區塊大小
+    ASSIGN_BLOCK_ROWS = 65536
+
+    def __init__(self, vectors, n_lists=None, n_probe=DEFAULT_N_PROBE, n_iter=10, seed=0):
+        self._vectors = vectors
+        n = vectors.shape[0]
+        self.n_lists = max(1, min(n, n_lists or int(np.sqrt(n))))
+        self.n_probe = n_probe
+        rng = np.random.default_rng(seed)
+
+        norms = np.concatenate([
+            np.linalg.norm(np.asarray(vectors[start:start + self.ASSIGN_BLOCK_ROWS], dtype=np.float32), axis=1)
+            for start in range(0, n, self.ASSIGN_BLOCK_ROWS)
+        ])
+        norms[norms == 0] = 1.0
+        self._inv_norms = (1.0 / norms).astype(np.float32)
+
+        # 只用抽樣資料訓練 k-means，再把全部向量分派到最近的中心
+        sample_ids = np.sort(rng.choice(n, size=min(n, self.n_lists * 64), replace=False))
+        sample = _normalize(vectors[sample_ids])
+        centroids = sample[rng.choice(len(sample), size=self.n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            filled = np.bincount(assign, minlength=self.n_lists) > 0
+            centroids[filled] = _normalize(sums[filled])
+        self.centroids = centroids
+
+        # 正規化不影響 argmax，分派時直接用原始向量
+        assign = np.concatenate([
+            np.argmax(np.asarray(vectors[start:start + self.ASSIGN_BLOCK_ROWS], dtype=np.float32) @ centroids.T, axis=1)
+            for start in range(0, n, self.ASSIGN_BLOCK_ROWS)
+        ])
+        self._order = np.argsort(assign, kind="stable").astype(np.int64)
+        self._offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=self.n_lists))])
+
+    def _list_rows(self, l):
+        return self._order[self._offsets[l]:self._offsets[l + 1]]
+
+    def search(self, queries, topk=10, n_probe=None):
+        """Batched top-k: returns (indices, scores), each shaped (n_queries, topk); missing slots are -1 / -inf.
+
+        Work is grouped by list: every probed list is read and normalised once and scored against
+        all queries that probe it in a single matrix product.
+        """
+        queries = _normalize(np.atleast_2d(queries))
+        n_queries = len(queries)
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        centroid_scores = queries @ self.centroids.T
+        probes = np.argpartition(-centroid_scores, n_probe - 1, axis=1)[:, :n_probe]
+
+        indices = np.full((n_queries, topk), -1, dtype=np.int64)
+        scores = np.full((n_queries, topk), -np.inf, dtype=np.float32)
+        probed_by = np.zeros((n_queries, self.n_lists), dtype=bool)
+        probed_by[np.arange(n_queries)[:, None], probes] = True
+
+        for l in np.flatnonzero(probed_by.any(axis=0)):
+            rows = self._list_rows(l)
+            if len(rows) == 0:
+                continue
+            qs = np.flatnonzero(probed_by[:, l])
+            block = np.asarray(self._vectors[rows], dtype=np.float32) * self._inv_norms[rows, None]
+            block_scores = queries[qs] @ block.T                      # (len(qs), len(rows))
+
+            # 把這個 list 的分數併進每個 query 目前的 top-k
+            merged_scores = np.concatenate([scores[qs], block_scores], axis=1)
+            merged_indices = np.concatenate([indices[qs], np.broadcast_to(rows, block_scores.shape)], axis=1)
+            k = min(topk, merged_scores.shape[1])
+            top = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+            scores[qs, :k] = np.take_along_axis(merged_scores, top, axis=1)
+            indices[qs, :k] = np.take_along_axis(merged_indices, top, axis=1)
+
+        order = np.argsort(-scores, axis=1, kind="stable")
+        return np.take_along_axis(indices, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+def get_ann_index(wv):
+    """IVFIndex over ``wv.vectors``, built once per KeyedVectors object."""
+    with _INDEX_CACHE_LOCK:
+        index = _INDEX_CACHE.get(wv)
+    if index is None:
+        index = IVFIndex(wv.vectors)
+        with _INDEX_CACHE_LOCK:
+            index = _INDEX_CACHE.setdefault(wv, index)
+    return index
+
+def most_similar_batch(wv, words, topn=10, n_probe=None):
+    """[(word, similarity), ...] neighbours for each of ``words`` from one batched index search."""
+    ids = [wv.key_to_index[word] for word in words]
+    indices, scores = get_ann_index(wv).search(wv.vectors[ids], topk=topn + 1, n_probe=n_probe)
+    results = []
+    for query_id, row_indices, row_scores in zip(ids, indices, scores):
+        neighbours = [
+            (wv.index_to_key[i], float(s)) for i, s in zip(row_indices, row_scores) if i >= 0 and i != query_id
+        ]
+        results.append(neighbours[:topn])
+    return results
+
+def most_similar(wv, word, topn=10, use_ann=None):
+    """Drop-in for ``wv.most_similar(word, topn)``; large vocabularies go through the ANN index."""
+    if use_ann is None:
+        use_ann = len(wv.key_to_index) >= ANN_MIN_VOCAB
+    if not use_ann:
+        return wv.most_similar(word, topn=topn)
+    return most_similar_batch(wv, [word], topn=topn)[0]
+
+def benchmark(wv, n_queries=200, topn=10, n_probes=(1, 4, 8, 16), seed=0):
+    """Recall@topn and per-query latency of the ANN index against gensim's exact most_similar."""
+    rng = np.random.default_rng(seed)
+    words = [wv.index_to_key[i] for i in rng.choice(len(wv.index_to_key), size=min(n_queries, len(wv.index_to_key)), replace=False)]
+
+    start = time.perf_counter()
+    exact = [{w for w, _ in wv.most_similar(word, topn=topn)} for word in words]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(words)
+
+    start = time.perf_counter()
+    get_ann_index(wv)
+    build_s = time.perf_counter() - start
+
+    rows = [{"method": "exact (gensim)", "n_probe": None, "recall": 1.0, "ms_per_query": round(exact_ms, 3)}]
+    for n_probe in n_probes:
+        start = time.perf_counter()
+        approx = most_similar_batch(wv, words, topn=topn, n_probe=n_probe)
+        ann_ms = (time.perf_counter() - start) * 1000 / len(words)
+        recall = np.mean([len(truth & {w for w, _ in found}) / max(len(truth), 1) for truth, found in zip(exact, approx)])
+        rows.append({"method": "ivf", "n_probe": n_probe, "recall": round(float(recall), 4), "ms_per_query": round(ann_ms, 3)})
+
+    print(f"Index build: {build_s:.2f}s over {len(wv.index_to_key)} words")
+    for row in rows:
+        print(row)
+    return rows
+
+def _synthetic_vectors(n_words, dim=100, n_topics=200, seed=0):
+    from gensim.models import KeyedVectors
+
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(n_topics, dim))
+    vectors = topics[rng.integers(n_topics, size=n_words)] + 0.5 * rng.normal(size=(n_words, dim))
+    wv = KeyedVectors(dim)
+    wv.add_vectors([f"w{i}" for i in range(n_words)], vectors.astype(np.float32))
+    return wv
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Recall/latency benchmark of the IVF index vs exact most_similar.")
+    parser.add_argument("--vectors", help="KeyedVectors file (default: synthetic clustered vectors)")
+    parser.add_argument("--words", type=int, default=50000, help="Vocabulary size of the synthetic vectors")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.vectors:
+        from gensim.models import KeyedVectors
+        wv = KeyedVectors.load(args.vectors, mmap="r")
+    else:
+        wv = _synthetic_vectors(args.words)
+    benchmark(wv, n_queries=args.queries)
@@ -0,0 +1,78 @@
+"""Word2Vec training throughput for each Word2vec module on synthetic corpora of increasing size.
+
+    python -m qa_utils.Word2vec.benchmark
+    python -m qa_utils.Word2vec.benchmark --sizes 1000 10000 100000 --workers 1 4 16 --output bench.json
+"""
+import argparse
+import json
+import os
+import time
+import numpy as np
+from gensim.models import Word2Vec
+from qa_utils.Word2vec.train_config import training_params
+
+# 各模組實際使用的訓練參數（與 run() 中 get_word_vectors 的呼叫一致）
+MODULE_PARAMS = {
+    "view_2d/view_3d": dict(sg=0),
+    "cbow": dict(sg=0),
+    "skipgram": dict(sg=1),
+    "negative_sampling": dict(sg=1, negative=10),
+}
+
+def synthetic_corpus(n_sentences, vocab_size=20000, mean_length=20, seed=0):
+    """Tokenised sentences with a Zipf-like word distribution, like real report text."""
+    rng = np.random.default_rng(seed)
+    ranks = np.arange(1, vocab_size + 1)
+    probs = 1.0 / ranks
+    probs /= probs.sum()
+    lengths = np.clip(rng.poisson(mean_length, size=n_sentences), 3, None)
+    word_ids = rng.choice(vocab_size, size=int(lengths.sum()), p=probs)
+    sentences = []
+    start = 0
+    for length in lengths:
+        sentences.append([f"w{i}" for i in word_ids[start:start + length]])
+        start += length
+    return sentences
+
+def benchmark_training(sentences, workers, **module_params):
+    params = training_params(**module_params)
+    params["workers"] = workers
+    start = time.perf_counter()
+    model = Word2Vec(sentences, **params)
+    wall = time.perf_counter() - start
+    raw_words = sum(len(s) for s in sentences) * params["epochs"]
+    return {
+        "wall_s": round(wall, 3),
+        "words_per_s": round(raw_words / wall),
+        "vocab": len(model.wv.index_to_key),
+    }
+
+def run_suite(sizes=(1000, 10000, 50000), workers_list=None, modules=None):
+    workers_list = workers_list or sorted({1, os.cpu_count() or 1})
+    modules = modules or list(MODULE_PARAMS)
+    rows = []
+    for n_sentences in sizes:
+        sentences = synthetic_corpus(n_sentences)
+        for module in modules:
+            for workers in workers_list:
+                row = {"module": module, "sentences": n_sentences, "workers": workers}
+                row.update(benchmark_training(sentences, workers, **MODULE_PARAMS[module]))
+                print(row)
+                rows.append(row)
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000], help="Corpus sizes in sentences")
+    parser.add_argument("--workers", type=int, nargs="+", default=None, help="Worker counts to compare")
+    parser.add_argument("--modules", nargs="+", choices=list(MODULE_PARAMS), default=None)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    rows = run_suite(args.sizes, args.workers, args.modules)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+if __name__ == "__main__":
+    main()
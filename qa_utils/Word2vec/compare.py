@@ -0,0 +1,89 @@
+import streamlit as st
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from qa_utils.Word2vec.model_cache import get_word2vec_model, peek_word2vec_model
+from qa_utils.Word2vec.ann_index import most_similar
+
+ARCHITECTURES = {"CBOW": 0, "Skip-gram": 1}
+NEGATIVE_OPTIONS = [5, 10, 15, 20]
+WINDOW_OPTIONS = [2, 5, 10]
+
+def _config_picker(label, key_prefix, default_arch):
+    st.markdown(f"**{label}**")
+    arch = st.selectbox("Architecture", list(ARCHITECTURES), index=list(ARCHITECTURES).index(default_arch),
+                        key=f"{key_prefix}_arch")
+    negative = st.selectbox("Negative samples", NEGATIVE_OPTIONS, index=0, key=f"{key_prefix}_negative")
+    window = st.selectbox("Window size", WINDOW_OPTIONS, index=1, key=f"{key_prefix}_window")
+    return {"sg": ARCHITECTURES[arch], "negative": negative, "window": window}
+
+def _config_label(config):
+    arch = "Skip-gram" if config["sg"] else "CBOW"
+    return f"{arch} (neg={config['negative']}, win={config['window']})"
+
+def render_model_comparison(tokenized_sentences, selected_word, key_prefix="compare", corpus=None, pretrained=False):
+    """Side-by-side similar words for two Word2Vec configurations.
+
+    Models come from the shared model cache; a configuration that has not been trained yet is only
+    trained once the comparison is switched on. Both models are trained on the same source as the
+    views above it: ``corpus`` (e.g. the uploaded PDF) when given, else the input sentences.
+    """
+    if pretrained:
+        # 預訓練向量只有一組固定的模型，沒有可比較的訓練設定
+        st.caption("ℹ️ Model comparison is unavailable while using pretrained vectors.")
+        return
+    if not st.toggle("Show model comparison", key=f"{key_prefix}_enabled"):
+        return
+    training_sentences = corpus if corpus is not None else tokenized_sentences
+
+    col_a, col_b = st.columns(2)
+    with col_a:
+        config_a = _config_picker("Model A", f"{key_prefix}_a", "CBOW")
+    with col_b:
+        config_b = _config_picker("Model B", f"{key_prefix}_b", "Skip-gram")
+
+    label_a, label_b = _config_label(config_a), _config_label(config_b)
+    missing = [label for label, config in [(label_a, config_a), (label_b, config_b)]
+               if peek_word2vec_model(training_sentences, **config) is None]
+    if missing:
+        st.caption(f"🏋️ Training: {', '.join(missing)} (other models are reused from cache)")
+
+    try:
+        wv_a = get_word2vec_model(training_sentences, **config_a).wv
+        wv_b = get_word2vec_model(training_sentences, **config_b).wv
+
+        if selected_word not in wv_a or selected_word not in wv_b:
+            st.warning("⚠️ Word not found in both models. Cannot compare similarity.")
+            return
+
+        similar_a = most_similar(wv_a, selected_word, topn=10)
+        similar_b = most_similar(wv_b, selected_word, topn=10)
+
+        rows = max(len(similar_a), len(similar_b))
+        pad = lambda items: list(items) + [None] * (rows - len(items))
+        comparison_df = pd.DataFrame({
+            f'{label_a}_Word': pad([w for w, _ in similar_a]),
+            f'{label_a}_Similarity': pad([s for _, s in similar_a]),
+            f'{label_b}_Word': pad([w for w, _ in similar_b]),
+            f'{label_b}_Similarity': pad([s for _, s in similar_b]),
+        })
+        st.dataframe(comparison_df, use_container_width=True)
+
+        # 以 Model A 的相似詞為 x 軸，兩個模型各自對同一組詞的相似度
+        words = [w for w, _ in similar_a]
+        scores_a = [s for _, s in similar_a]
+        scores_b = [float(wv_b.similarity(selected_word, w)) if w in wv_b else 0.0 for w in words]
+
+        fig, ax = plt.subplots(figsize=(10, 5))
+        x = np.arange(len(words))
+        ax.bar(x - 0.2, scores_a, width=0.4, label=label_a, color='lightblue')
+        ax.bar(x + 0.2, scores_b, width=0.4, label=label_b, color='orange')
+        ax.set_xticks(x)
+        ax.set_xticklabels(words, rotation=45)
+        ax.set_ylabel('Cosine Similarity')
+        ax.set_title(f"Similarity Comparison for '{selected_word}'")
+        ax.legend()
+        st.pyplot(fig)
+
+    except Exception as e:
+        st.error(f"Error comparing models: {e}")
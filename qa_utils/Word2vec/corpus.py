@@ -0,0 +1,51 @@
+import hashlib
+import re
+import streamlit as st
+from gensim.utils import simple_preprocess
+from analyze_esg import CHINESE_RATIO_THRESHOLD, chinese_ratio, segment_chinese, esg_user_words
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?。！？；;])\s+|[。！？\n]")
+
+class PdfSentenceCorpus:
+    """Restartable iterable of tokenised sentences, read page by page from the parsed PDF.
+
+    gensim iterates it once to build the vocabulary and once per epoch; only one page is decoded
+    and tokenised at a time, so the full report is never materialised as a list of sentences.
+    """
+
+    def __init__(self, pages, min_tokens=2):
+        self.pages = pages
+        self.min_tokens = min_tokens
+
+    def __iter__(self):
+        user_words = None
+        for p in self.pages:
+            # simple_preprocess 會把整串中文當成一個 token（超過 15 字就丟掉），中文頁改用 jieba 斷詞
+            is_chinese = chinese_ratio(p["content"]) > CHINESE_RATIO_THRESHOLD
+            if is_chinese and user_words is None:
+                user_words = esg_user_words()
+            for sentence in _SENTENCE_SPLIT.split(p["content"]):
+                if is_chinese:
+                    tokens = segment_chinese(sentence, workers=1, user_words=user_words)
+                else:
+                    tokens = simple_preprocess(sentence)
+                if len(tokens) >= self.min_tokens:
+                    yield tokens
+
+    def cache_key(self):
+        """Hash of the page texts, so the model cache does not have to tokenise the corpus to key it."""
+        h = hashlib.sha1(f"pdf-corpus:jieba:{self.min_tokens}".encode("utf-8"))
+        for p in self.pages:
+            h.update(str(p["page"]).encode("utf-8"))
+            h.update(p["content"].encode("utf-8"))
+        return h.hexdigest()
+
+def training_corpus():
+    """The uploaded PDF as a training corpus if the user opted in and parsing has finished, else None."""
+    if not st.session_state.get("use_pdf_corpus"):
+        return None
+    pages = st.session_state.get("pdf_text")
+    job = st.session_state.get("pdf_job")
+    if not pages or (job and not job["done"]):
+        return None
+    return PdfSentenceCorpus(pages)
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from gensim.models import Word2Vec, KeyedVectors
+from qa_utils.Word2vec.train_config import training_params
+
+# 同時保留的模型數量上限，超過時淘汰最久沒用到的
+MAX_CACHED_MODELS = 8
+
+_MODEL_CACHE = OrderedDict()
+_MODEL_CACHE_LOCK = threading.Lock()
+
+def model_key(tokenized_sentences, **params):
+    """Hash of the tokenised sentences plus the training hyperparameters."""
+    h = hashlib.sha1()
+    if hasattr(tokenized_sentences, "cache_key"):
+        # 串流語料（例如 PdfSentenceCorpus）自己提供 key，不必為了算 key 先走過一遍
+        h.update(tokenized_sentences.cache_key().encode("utf-8"))
+    else:
+        for sentence in tokenized_sentences:
+            h.update("\x1f".join(sentence).encode("utf-8"))
+            h.update(b"\x1e")
+    h.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    return h.hexdigest()
+
+def _resolve_params(sg, vector_size, window, negative, **overrides):
+    """(cache key params, runtime params) for one model.
+
+    The worker count and the (fixed) hash function are kept out of the cache key: the former does
+    not change what is learned and the latter is not JSON-serialisable.
+    """
+    params = training_params(sg=sg, vector_size=vector_size, window=window, negative=negative, **overrides)
+    runtime = {"workers": params.pop("workers"), "hashfxn": params.pop("hashfxn")}
+    return params, runtime
+
+def peek_word2vec_model(tokenized_sentences, sg=0, vector_size=100, window=5, negative=5, **overrides):
+    """The cached model for these sentences and hyperparameters, or None if it has not been trained."""
+    params, _ = _resolve_params(sg, vector_size, window, negative, **overrides)
+    with _MODEL_CACHE_LOCK:
+        return _MODEL_CACHE.get(model_key(tokenized_sentences, **params))
+
+def get_word2vec_model(tokenized_sentences, sg=0, vector_size=100, window=5, negative=5, **overrides):
+    """Word2Vec trained on ``tokenized_sentences``, shared across reruns, sessions and the Word2vec modules.
+
+    A model is trained only the first time a (sentences, hyperparameters) pair is seen; Streamlit
+    reruns caused by widget changes reuse it. Seed, epochs, sample, min_count and workers come from
+    train_config.TRAINING_CONFIG unless overridden.
+    """
+    params, runtime = _resolve_params(sg, vector_size, window, negative, **overrides)
+    key = model_key(tokenized_sentences, **params)
+
+    with _MODEL_CACHE_LOCK:
+        model = _MODEL_CACHE.get(key)
+        if model is not None:
+            _MODEL_CACHE.move_to_end(key)
+            return model
+
+    model = Word2Vec(tokenized_sentences, **runtime, **params)
+
+    with _MODEL_CACHE_LOCK:
+        # 其他 session 可能同時訓練好同一個模型，以先放進快取的為準
+        model = _MODEL_CACHE.setdefault(key, model)
+        _MODEL_CACHE.move_to_end(key)
+        while len(_MODEL_CACHE) > MAX_CACHED_MODELS:
+            _MODEL_CACHE.popitem(last=False)
+    return model
+
+# 離線以報告語料訓練、用 save_pretrained_vectors 存下的 KeyedVectors
+PRETRAINED_VECTORS_PATH = os.environ.get("W2V_PRETRAINED_PATH", "db/word2vec/report_corpus.kv")
+MAX_CACHED_SUBSETS = 16
+
+_PRETRAINED = {}
+_PRETRAINED_LOCK = threading.Lock()
+_SUBSET_CACHE = weakref.WeakKeyDictionary()
+
+def pretrained_vectors_available(path=PRETRAINED_VECTORS_PATH):
+    return os.path.exists(path)
+
+def save_pretrained_vectors(wv, path=PRETRAINED_VECTORS_PATH):
+    """Save KeyedVectors with the vector matrix in its own .npy file so it can be memory-mapped."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    wv.save(path, separately=["vectors"])
+
+def load_pretrained_vectors(path=PRETRAINED_VECTORS_PATH):
+    """Read-only, memory-mapped KeyedVectors, loaded once per process and shared by every session."""
+    with _PRETRAINED_LOCK:
+        wv = _PRETRAINED.get(path)
+        if wv is None:
+            wv = _PRETRAINED[path] = KeyedVectors.load(path, mmap="r")
+    return wv
+
+def get_word_vectors(tokenized_sentences, pretrained=False, corpus=None, **params):
+    """KeyedVectors for similarity lookups.
+
+    The pretrained corpus vectors, a (cached) model trained on ``corpus`` (any restartable iterable
+    of tokenised sentences, e.g. the uploaded PDF), or one trained on the input sentences.
+    """
+    if pretrained:
+        return load_pretrained_vectors()
+    if corpus is not None:
+        return get_word2vec_model(corpus, **params).wv
+    return get_word2vec_model(tokenized_sentences, **params).wv
+
+def vocabulary_for_sentences(wv, tokenized_sentences):
+    """KeyedVectors restricted to the words of the input sentences, for plotting and word selection.
+
+    A model trained on the sentences already has exactly that vocabulary and is returned as is;
+    for the pretrained vectors a small subset (in the pretrained frequency order) is built and cached.
+    """
+    words = {word for sentence in tokenized_sentences for word in sentence if word in wv.key_to_index}
+    if len(words) == len(wv.key_to_index):
+        return wv
+
+    key = model_key(tokenized_sentences)
+    with _MODEL_CACHE_LOCK:
+        subsets = _SUBSET_CACHE.setdefault(wv, OrderedDict())
+        subset = subsets.get(key)
+        if subset is not None:
+            subsets.move_to_end(key)
+            return subset
+
+    ordered = sorted(words, key=wv.key_to_index.get)
+    subset = KeyedVectors(wv.vector_size)
+    if ordered:
+        subset.add_vectors(ordered, wv[ordered])
+
+    with _MODEL_CACHE_LOCK:
+        subsets[key] = subset
+        while len(subsets) > MAX_CACHED_SUBSETS:
+            subsets.popitem(last=False)
+    return subset
@@ -1,7 +1,9 @@
 import streamlit as st
 import numpy as np
 import matplotlib.pyplot as plt
-from gensim.models import Word2Vec
+from qa_utils.Word2vec.model_cache import get_word_vectors, vocabulary_for_sentences
+from qa_utils.Word2vec.corpus import training_corpus
+from qa_utils.Word2vec.ann_index import most_similar
 from gensim.utils import simple_preprocess
 import time
 
@@ -17,16 +19,18 @@ def run(sentences):
         return
 
     # Train a Word2Vec model using Skip-gram + Negative Sampling
-    model = Word2Vec(tokenized_sentences, vector_size=100, window=5, min_count=1, workers=4, sg=1, negative=10)
+    wv = get_word_vectors(tokenized_sentences, sg=1, negative=10, pretrained=st.session_state.get("use_pretrained_vectors", False),
+                          corpus=training_corpus())
+    plot_wv = vocabulary_for_sentences(wv, tokenized_sentences)
 
     st.markdown("### 🎯 Select a Word to Explore")
     selected_word = st.selectbox(
         "Choose a word from the vocabulary:",
-        options=model.wv.index_to_key
+        options=plot_wv.index_to_key
     )
 
     if selected_word:
-        similar_words = model.wv.most_similar(selected_word, topn=10)
+        similar_words = most_similar(wv, selected_word, topn=10)
 
         words = [w for w, _ in similar_words]
         similarities = [s for _, s in similar_words]
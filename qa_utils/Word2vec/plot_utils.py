@@ -0,0 +1,111 @@
+import os
+import numpy as np
+import matplotlib.pyplot as plt
+import streamlit as st
+
+# 句子中沒有出現的詞（例如預訓練模型的字彙）使用的顏色
+DEFAULT_WORD_COLOR = "#999999"
+# 散佈圖最多畫幾個詞、其中幾個顯示文字標籤
+MAX_PLOT_POINTS = 2000
+MAX_PLOT_LABELS = 100
+# 每張圖最多畫幾條句子連線
+MAX_SENTENCE_TRACES = 20
+# 估算圖表大小用：每個點在 figure JSON 中約佔的位元組（座標、顏色、id、hover 文字）
+PLOT_BYTES_PER_POINT = 110
+# 設為 1 時改用 fig.to_json() 量測實際大小（每次 rerun 會多序列化一次整張圖，只供除錯）
+PLOT_DEBUG_PAYLOAD = os.environ.get("PLOT_DEBUG_PAYLOAD", "").lower() in ("1", "true", "yes")
+
+def sentence_hex_colors(n_sentences):
+    cmap = plt.get_cmap('tab20', n_sentences)  # 安全使用 N 個顏色
+    return [
+        '#%02x%02x%02x' % (int(r*255), int(g*255), int(b*255))
+        for r, g, b, a in [cmap(i) for i in range(n_sentences)]
+    ]
+
+def first_sentence_ids(index_to_key, tokenized_sentences):
+    """Inverted index: id of the first sentence containing each vocabulary word (-1 if none).
+
+    One pass over all tokens instead of checking every word against every sentence.
+    """
+    first = {}
+    for i, sentence in enumerate(tokenized_sentences):
+        for word in sentence:
+            first.setdefault(word, i)
+    return np.fromiter((first.get(word, -1) for word in index_to_key), dtype=np.int64, count=len(index_to_key))
+
+def word_colors(index_to_key, tokenized_sentences, hex_colors, default=DEFAULT_WORD_COLOR):
+    """Colour of each vocabulary word = colour of the first sentence it appears in."""
+    palette = np.array(list(hex_colors) + [default], dtype=object)
+    # id -1 正好取到最後的 default 顏色
+    return palette[first_sentence_ids(index_to_key, tokenized_sentences)].tolist()
+
+def sentence_indices(wv, sentence):
+    """Row indices into wv.vectors (and its projections) for the in-vocabulary words of ``sentence``."""
+    key_to_index = wv.key_to_index
+    return np.fromiter((key_to_index[word] for word in sentence if word in key_to_index), dtype=np.int64)
+
+def sentence_coordinates(wv, sentence, reduced_vectors):
+    """(n_words, n_components) array of projected coordinates along ``sentence``."""
+    return reduced_vectors[sentence_indices(wv, sentence)]
+
+def sample_word_indices(reduced_vectors, max_points=MAX_PLOT_POINTS, method="frequency"):
+    """Rows of ``reduced_vectors`` to plot, most frequent first.
+
+    Vocabulary order is gensim's frequency rank, so "frequency" keeps the top ``max_points``
+    words. "density" lays a grid over the first two projected axes, keeps the most frequent
+    word of every occupied cell so sparse regions stay visible, then fills up by frequency.
+    """
+    n = len(reduced_vectors)
+    if n <= max_points:
+        return np.arange(n)
+    if method == "frequency":
+        return np.arange(max_points)
+    if method != "density":
+        raise ValueError(f"Unknown sampling method: {method}")
+
+    grid = max(1, int(np.sqrt(max_points)))
+    xy = reduced_vectors[:, :2]
+    lo, hi = xy.min(axis=0), xy.max(axis=0)
+    cells = np.clip(((xy - lo) / np.where(hi > lo, hi - lo, 1) * grid).astype(np.int64), 0, grid - 1)
+    # np.unique 回傳每個格子第一次出現的位置，也就是該格最常見的詞
+    _, first = np.unique(cells[:, 0] * grid + cells[:, 1], return_index=True)
+    chosen = np.sort(first)[:max_points]
+    if len(chosen) < max_points:
+        rest = np.setdiff1d(np.arange(n), chosen, assume_unique=True)[:max_points - len(chosen)]
+        chosen = np.sort(np.concatenate([chosen, rest]))
+    return chosen
+
+def downsample_words(index_to_key, reduced_vectors, colors, max_points=MAX_PLOT_POINTS,
+                     max_labels=MAX_PLOT_LABELS, method="frequency"):
+    """Subset of words to send to the browser; only the ``max_labels`` most frequent get a text label."""
+    idx = sample_word_indices(reduced_vectors, max_points, method)
+    words = [index_to_key[i] for i in idx]
+    return {
+        "idx": idx,
+        "words": words,
+        "labels": [w if rank < max_labels else "" for rank, w in enumerate(words)],
+        "coords": reduced_vectors[idx],
+        "colors": np.asarray(colors, dtype=object)[idx].tolist(),
+    }
+
+def render_plot_options(key_prefix):
+    """Rendering caps for large vocabularies (points, labels, sampling)."""
+    with st.expander("⚙️ Rendering options", expanded=False):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            max_points = st.number_input("Max points", min_value=10, value=MAX_PLOT_POINTS, step=500,
+                                         key=f"{key_prefix}_max_points")
+        with col2:
+            max_labels = st.number_input("Labelled words", min_value=0, value=MAX_PLOT_LABELS, step=50,
+                                         key=f"{key_prefix}_max_labels")
+        with col3:
+            method = st.selectbox("Sampling", ["frequency", "density"], key=f"{key_prefix}_sampling")
+    return {"max_points": int(max_points), "max_labels": int(max_labels), "method": method}
+
+def show_payload_size(fig, shown, total):
+    """Caption with the plotted word count; the payload is estimated unless PLOT_DEBUG_PAYLOAD is set."""
+    if PLOT_DEBUG_PAYLOAD:
+        payload = f"figure payload {len(fig.to_json()) / 1024:,.0f} KB"
+    else:
+        payload = f"figure payload ~{shown * PLOT_BYTES_PER_POINT / 1024:,.0f} KB"
+    st.caption(f"📦 Plotted {shown:,}/{total:,} words · {payload}")
@@ -0,0 +1,41 @@
+import threading
+import weakref
+from sklearn.decomposition import PCA, IncrementalPCA
+
+# 字彙量超過此值時 "auto" 改用 randomized PCA
+RANDOMIZED_PCA_MIN_WORDS = 5000
+INCREMENTAL_PCA_BATCH_SIZE = 2048
+
+# 以 KeyedVectors 物件為 key，模型被淘汰後投影也跟著釋放
+_PROJECTION_CACHE = weakref.WeakKeyDictionary()
+_PROJECTION_CACHE_LOCK = threading.Lock()
+
+def _fit_projection(vectors, method):
+    if method == "auto":
+        method = "randomized" if vectors.shape[0] >= RANDOMIZED_PCA_MIN_WORDS else "exact"
+    if method == "exact":
+        return PCA(n_components=3).fit_transform(vectors)
+    if method == "randomized":
+        return PCA(n_components=3, svd_solver="randomized", random_state=0).fit_transform(vectors)
+    if method == "incremental":
+        return IncrementalPCA(n_components=3, batch_size=max(INCREMENTAL_PCA_BATCH_SIZE, 3)).fit_transform(vectors)
+    raise ValueError(f"Unknown projection method: {method}")
+
+def project_vectors(wv, method="auto"):
+    """3-component PCA projection of ``wv.vectors``, computed once per model and method.
+
+    Rows follow ``wv.index_to_key``. Use ``[:, :2]`` for 2D plots: PCA components are ordered
+    by explained variance, so the first two columns equal a 2-component fit.
+    method: "exact", "randomized", "incremental" (bounded memory for large vocabularies) or "auto".
+    """
+    with _PROJECTION_CACHE_LOCK:
+        cached = _PROJECTION_CACHE.get(wv)
+        if cached is not None and method in cached:
+            return cached[method]
+
+    # 直接讀 wv.vectors，不再逐字組出新的 array
+    reduced = _fit_projection(wv.vectors, method)
+
+    with _PROJECTION_CACHE_LOCK:
+        _PROJECTION_CACHE.setdefault(wv, {})[method] = reduced
+    return reduced
@@ -1,9 +1,12 @@
 import streamlit as st
-import numpy as np
 import matplotlib.pyplot as plt
-from gensim.models import Word2Vec
+from qa_utils.Word2vec.model_cache import get_word_vectors, vocabulary_for_sentences
+from qa_utils.Word2vec.corpus import training_corpus
+from qa_utils.Word2vec.ann_index import most_similar
+from qa_utils.Word2vec.projection import project_vectors
+from qa_utils.Word2vec.plot_utils import sentence_hex_colors, word_colors, sentence_coordinates, \
+    downsample_words, render_plot_options, show_payload_size
 from gensim.utils import simple_preprocess
-from sklearn.decomposition import PCA
 import plotly.graph_objs as go
 import time
 
@@ -19,10 +22,12 @@ def run(sentences):
         return
 
     # Train Skip-gram model (sg=1)
-    model = Word2Vec(tokenized_sentences, vector_size=100, window=5, min_count=1, workers=4, sg=1)
+    wv = get_word_vectors(tokenized_sentences, sg=1, pretrained=st.session_state.get("use_pretrained_vectors", False),
+                          corpus=training_corpus())
+    plot_wv = vocabulary_for_sentences(wv, tokenized_sentences)
 
-    # Word vectors
-    word_vectors = np.array([model.wv[word] for word in model.wv.index_to_key])
+    # Word vectors (no copy)
+    word_vectors = plot_wv.vectors
 
     if word_vectors.shape[0] < 3:
         st.error("❌ Not enough words for visualization.")
@@ -43,43 +48,38 @@ def run(sentences):
     plot_option = st.radio("📈 Choose plot type:", ["2D Plot", "3D Plot"], horizontal=True)
 
     # Color for each sentence
-    cmap = plt.get_cmap('tab20', len(tokenized_sentences))
-    hex_colors = [
-        '#%02x%02x%02x' % (int(r*255), int(g*255), int(b*255))
-        for r, g, b, a in [cmap(i) for i in range(len(tokenized_sentences))]
-    ]
-
-    word_colors = []
-    for word in model.wv.index_to_key:
-        for i, sentence in enumerate(tokenized_sentences):
-            if word in sentence:
-                word_colors.append(hex_colors[i])
-                break
-
-    # Dimension reduction
+    hex_colors = sentence_hex_colors(len(tokenized_sentences))
+    colors = word_colors(plot_wv.index_to_key, tokenized_sentences, hex_colors)
+
+    # Dimension reduction: one cached 3D projection serves both plots
     n_components = 2 if plot_option == "2D Plot" else 3
-    reduced_vectors = PCA(n_components=n_components).fit_transform(word_vectors)
+    reduced_vectors = project_vectors(plot_wv)[:, :n_components]
+
+    # 詞彙很多時只送出部分詞到瀏覽器，並只為最常見的詞加上文字
+    plot_options = render_plot_options("skipgram")
+    points = downsample_words(plot_wv.index_to_key, reduced_vectors, colors, **plot_options)
 
     # --- Section 3: Scatter plot ---
     if plot_option == "2D Plot":
-        scatter = go.Scatter(
-            x=reduced_vectors[:, 0],
-            y=reduced_vectors[:, 1],
+        scatter = go.Scattergl(
+            x=points["coords"][:, 0],
+            y=points["coords"][:, 1],
             mode='markers+text',
-            text=model.wv.index_to_key,
+            text=points["labels"],
+            hovertext=points["words"],
             textposition='top center',
-            marker=dict(color=word_colors, size=8),
-            hovertemplate="Word: %{text}",
+            marker=dict(color=points["colors"], size=8),
+            hovertemplate="Word: %{hovertext}",
             name="Words"
         )
         fig = go.Figure(data=[scatter])
 
         for i in selected_indices:
-            line_vectors = [reduced_vectors[model.wv.key_to_index[word]] for word in tokenized_sentences[i] if word in model.wv]
+            line_vectors = sentence_coordinates(plot_wv, tokenized_sentences[i], reduced_vectors)
             if len(line_vectors) > 1:
-                fig.add_trace(go.Scatter(
-                    x=[v[0] for v in line_vectors],
-                    y=[v[1] for v in line_vectors],
+                fig.add_trace(go.Scattergl(
+                    x=line_vectors[:, 0],
+                    y=line_vectors[:, 1],
                     mode='lines',
                     line=dict(color=hex_colors[i], width=1),
                     showlegend=True,
@@ -95,24 +95,25 @@ def run(sentences):
 
     else:  # 3D Plot
         scatter = go.Scatter3d(
-            x=reduced_vectors[:, 0],
-            y=reduced_vectors[:, 1],
-            z=reduced_vectors[:, 2],
+            x=points["coords"][:, 0],
+            y=points["coords"][:, 1],
+            z=points["coords"][:, 2],
             mode='markers+text',
-            text=model.wv.index_to_key,
-            marker=dict(color=word_colors, size=3),
-            hovertemplate="Word: %{text}",
+            text=points["labels"],
+            hovertext=points["words"],
+            marker=dict(color=points["colors"], size=3),
+            hovertemplate="Word: %{hovertext}",
             name="Words"
         )
         fig = go.Figure(data=[scatter])
 
         for i in selected_indices:
-            line_vectors = [reduced_vectors[model.wv.key_to_index[word]] for word in tokenized_sentences[i] if word in model.wv]
+            line_vectors = sentence_coordinates(plot_wv, tokenized_sentences[i], reduced_vectors)
             if len(line_vectors) > 1:
                 fig.add_trace(go.Scatter3d(
-                    x=[v[0] for v in line_vectors],
-                    y=[v[1] for v in line_vectors],
-                    z=[v[2] for v in line_vectors],
+                    x=line_vectors[:, 0],
+                    y=line_vectors[:, 1],
+                    z=line_vectors[:, 2],
                     mode='lines',
                     line=dict(color=hex_colors[i], width=2),
                     name=f"Sentence {i+1}"
@@ -124,14 +125,15 @@ def run(sentences):
             width=1000, height=800
         )
 
+    show_payload_size(fig, len(points["idx"]), len(plot_wv.index_to_key))
     st.plotly_chart(fig, use_container_width=True, key=f"skipgram_plot_{time.time()}")
 
     # --- Section 4: Explore similar words ---
     st.markdown("### 🔍 Explore Similar Words")
-    selected_word = st.selectbox("Choose a word to find similar words:", model.wv.index_to_key)
+    selected_word = st.selectbox("Choose a word to find similar words:", plot_wv.index_to_key)
 
     if selected_word:
-        similar_words = model.wv.most_similar(selected_word, topn=10)
+        similar_words = most_similar(wv, selected_word, topn=10)
 
         words = [w for w, _ in similar_words]
         similarities = [s for _, s in similar_words]
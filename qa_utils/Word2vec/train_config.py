@@ -0,0 +1,35 @@
+import os
+import zlib
+
+def _env(name, default, cast):
+    value = os.environ.get(name)
+    return default if value in (None, "") else cast(value)
+
+# 所有 Word2Vec 訓練共用的設定，可用環境變數覆寫
+TRAINING_CONFIG = {
+    "workers": _env("W2V_WORKERS", os.cpu_count() or 1, int),
+    "seed": _env("W2V_SEED", 1, int),
+    "epochs": _env("W2V_EPOCHS", 5, int),
+    "sample": _env("W2V_SAMPLE", 1e-3, float),
+    "min_count": _env("W2V_MIN_COUNT", 1, int),
+    # gensim 只有在單一 worker 時結果才可重現（另見 stable_hash）
+    "deterministic": _env("W2V_DETERMINISTIC", False, lambda v: v.lower() in ("1", "true", "yes")),
+}
+
+def stable_hash(text):
+    """Process-independent replacement for gensim's default ``hashfxn=hash``.
+
+    gensim seeds each word's initial vector from ``hashfxn(word + str(seed))``; Python's ``hash``
+    of a str changes between processes unless PYTHONHASHSEED is fixed, so the same seed would
+    still give different models after a restart.
+    """
+    return zlib.crc32(text.encode("utf-8"))
+
+def training_params(**overrides):
+    """Word2Vec keyword arguments: TRAINING_CONFIG with per-call overrides (sg, window, negative, ...)."""
+    params = {key: value for key, value in TRAINING_CONFIG.items() if key != "deterministic"}
+    params["hashfxn"] = stable_hash
+    params.update(overrides)
+    if TRAINING_CONFIG["deterministic"]:
+        params["workers"] = 1
+    return params
@@ -1,13 +1,14 @@
 import time
-import numpy as np
 import plotly.express as px
 import plotly.graph_objs as go
-from sklearn.decomposition import PCA
 import streamlit as st
-from gensim.models import Word2Vec
+from qa_utils.Word2vec.model_cache import get_word_vectors, vocabulary_for_sentences
+from qa_utils.Word2vec.corpus import training_corpus
+from qa_utils.Word2vec.projection import project_vectors
+from qa_utils.Word2vec.plot_utils import sentence_hex_colors, word_colors, sentence_coordinates, \
+    downsample_words, render_plot_options, show_payload_size, MAX_SENTENCE_TRACES
 from gensim.utils import simple_preprocess
 import pandas as pd
-import matplotlib.pyplot as plt
 
 def run(sentences):
     st.subheader("🧭 2D Vector Space View")
@@ -22,11 +23,13 @@ def run(sentences):
         st.error("❌ No valid words found in your input. Please enter meaningful sentences with actual words.")
         return
 
-    # Train a Word2Vec model
-    model = Word2Vec(tokenized_sentences, vector_size=100, window=5, min_count=1, workers=4)
+    # Train a Word2Vec model (cached across reruns)
+    wv = get_word_vectors(tokenized_sentences, pretrained=st.session_state.get("use_pretrained_vectors", False),
+                          corpus=training_corpus())
+    plot_wv = vocabulary_for_sentences(wv, tokenized_sentences)
 
-    # Get the word vectors
-    word_vectors = np.array([model.wv[word] for word in model.wv.index_to_key])
+    # Get the word vectors (no copy)
+    word_vectors = plot_wv.vectors
 
     # 防止 PCA 出錯
     if word_vectors.shape[0] < 3 or word_vectors.shape[1] < 3:
@@ -37,9 +40,8 @@ def run(sentences):
         )
         return
 
-    # Reduce the dimensions to 3D using PCA
-    pca = PCA(n_components=3)
-    reduced_vectors = pca.fit_transform(word_vectors)
+    # Reduce the dimensions to 3D using PCA (cached per model)
+    reduced_vectors = project_vectors(plot_wv)
 
     # print(model.wv.index_to_key)
     # # try to display model.wv.index_to_key and its vector
@@ -47,48 +49,45 @@ def run(sentences):
     # for word in model.wv.index_to_key:
     #   print(word, model.wv[word])
 
-    cmap = plt.get_cmap('tab20', len(tokenized_sentences))  # 安全使用 N 個顏色
-    hex_colors = [
-        '#%02x%02x%02x' % (int(r*255), int(g*255), int(b*255))
-        for r, g, b, a in [cmap(i) for i in range(len(tokenized_sentences))]
-    ]
-
-    # 為每個 word 分配所屬句子的顏色
-    word_colors = []
-    for word in model.wv.index_to_key:
-        for i, sentence in enumerate(tokenized_sentences):
-            if word in sentence:
-                word_colors.append(hex_colors[i])
-                break
+    hex_colors = sentence_hex_colors(len(tokenized_sentences))
+
+    # 為每個 word 分配所屬句子的顏色（先建 word -> 第一個句子的反向索引）
+    colors = word_colors(plot_wv.index_to_key, tokenized_sentences, hex_colors)
     color_map = hex_colors
 
-    word_ids = [f"word-{i}" for i in range(len(model.wv.index_to_key))]
+    # 詞彙很多時只送出部分詞到瀏覽器，並只為最常見的詞加上文字
+    options = render_plot_options("view2d")
+    points = downsample_words(plot_wv.index_to_key, reduced_vectors, colors, **options)
+    word_ids = [f"word-{i}" for i in points["idx"]]
 
-    # Create a 2D scatter plot using Plotly
-    scatter = go.Scatter(
-        x=reduced_vectors[:, 0],
-        y=reduced_vectors[:, 1],
+    # Create a 2D scatter plot using Plotly (WebGL)
+    scatter = go.Scattergl(
+        x=points["coords"][:, 0],
+        y=points["coords"][:, 1],
         mode='markers+text',
-        text=model.wv.index_to_key,
+        text=points["labels"],
+        hovertext=points["words"],
         textposition='top center',
-        marker=dict(color=word_colors, size=8),
-        customdata=word_colors,
+        marker=dict(color=points["colors"], size=8),
+        customdata=points["colors"],
         ids=word_ids,
-        hovertemplate="Word: %{text}<br>Color: %{customdata}",
+        hovertemplate="Word: %{hovertext}<br>Color: %{customdata}",
         name="Words"
     )
 
     # Create line traces for each displayed sentence
-    display_array = [True] * len(tokenized_sentences) # Example display array
+    display_array = [i < MAX_SENTENCE_TRACES for i in range(len(tokenized_sentences))]
+    if len(tokenized_sentences) > MAX_SENTENCE_TRACES:
+        st.caption(f"✏️ Showing connection lines for the first {MAX_SENTENCE_TRACES} of {len(tokenized_sentences)} sentences.")
 
     # Create line traces for each sentence
     line_traces = []
     for i, sentence in enumerate(tokenized_sentences):
         if display_array[i]:
-            line_vectors = [reduced_vectors[model.wv.key_to_index[word]] for word in sentence]
-            line_trace = go.Scatter(
-                x=[vector[0] for vector in line_vectors],
-                y=[vector[1] for vector in line_vectors],
+            line_vectors = sentence_coordinates(plot_wv, sentence, reduced_vectors)
+            line_trace = go.Scattergl(
+                x=line_vectors[:, 0],
+                y=line_vectors[:, 1],
                 mode='lines',
                 line=dict(color=color_map[i], width=1, dash='solid'),
                 showlegend=True,
@@ -115,4 +114,5 @@ def run(sentences):
             st.markdown(f"**Sentence {i}:** {sentence}")
 
     # Show the plot
+    show_payload_size(fig, len(points["idx"]), len(plot_wv.index_to_key))
     st.plotly_chart(fig, use_container_width=True, key=f"view2d_plotly_chart_{time.time()}")
\ No newline at end of file
@@ -1,11 +1,12 @@
 import time
-import numpy as np
 import plotly.graph_objs as go
-from sklearn.decomposition import PCA
 import streamlit as st
-from gensim.models import Word2Vec
+from qa_utils.Word2vec.model_cache import get_word_vectors, vocabulary_for_sentences
+from qa_utils.Word2vec.corpus import training_corpus
+from qa_utils.Word2vec.projection import project_vectors
+from qa_utils.Word2vec.plot_utils import sentence_hex_colors, word_colors, sentence_coordinates, \
+    downsample_words, render_plot_options, show_payload_size
 from gensim.utils import simple_preprocess
-import matplotlib.pyplot as plt
 
 def init_session_state(sentences):
     st.session_state.setdefault("selected_indices_3d", [0, 1])
@@ -17,29 +18,30 @@ def multiselect_changed(key, new_value):
         st.session_state[key] = new_value
         st.session_state["trigger_plot_3d"] = False
 
-def _draw_scatter(reduced_vectors, model, word_colors):
+def _draw_scatter(points):
     return go.Scatter3d(
-        x=reduced_vectors[:, 0],
-        y=reduced_vectors[:, 1],
-        z=reduced_vectors[:, 2],
+        x=points["coords"][:, 0],
+        y=points["coords"][:, 1],
+        z=points["coords"][:, 2],
         mode='markers+text',
-        text=model.wv.index_to_key,
-        marker=dict(color=word_colors, size=3),
-        hovertemplate="Word: %{text}",
+        text=points["labels"],
+        hovertext=points["words"],
+        marker=dict(color=points["colors"], size=3),
+        hovertemplate="Word: %{hovertext}",
         name="Words"
     )
 
-def _draw_lines(reduced_vectors, model, tokenized_sentences, hex_colors):
+def _draw_lines(reduced_vectors, plot_wv, tokenized_sentences, hex_colors):
     traces = []
     for i in st.session_state["selected_indices_3d"]:
         if i >= len(tokenized_sentences):
             continue
-        line_vectors = [reduced_vectors[model.wv.key_to_index[word]] for word in tokenized_sentences[i] if word in model.wv.key_to_index]
+        line_vectors = sentence_coordinates(plot_wv, tokenized_sentences[i], reduced_vectors)
         if len(line_vectors) > 1:
             traces.append(go.Scatter3d(
-                x=[v[0] for v in line_vectors],
-                y=[v[1] for v in line_vectors],
-                z=[v[2] for v in line_vectors],
+                x=line_vectors[:, 0],
+                y=line_vectors[:, 1],
+                z=line_vectors[:, 2],
                 mode='lines',
                 line=dict(color=hex_colors[i], width=2),
                 name=f"Sentence {i+1}",
@@ -76,33 +78,31 @@ def run(sentences):
                 st.session_state["sentence_picker"] = [f"Sentence {i+1}: {s}" for i, s in enumerate(sentences[:2])]
                 st.session_state["trigger_plot_3d"] = False
 
+    plot_options = render_plot_options("view3d")
+
     if not st.session_state.get("trigger_plot_3d", False):
         st.warning("⚠️ You've modified your selection. Please click 'Run Visualization' again.")
         return
 
     with st.spinner("🔄 Rendering 3D Word Embedding Plot..."):
         tokenized_sentences = [simple_preprocess(s) for s in sentences]
-        model = Word2Vec(tokenized_sentences, vector_size=100, window=5, min_count=1, workers=4)
-        word_vectors = np.array([model.wv[word] for word in model.wv.index_to_key])
+        wv = get_word_vectors(tokenized_sentences, pretrained=st.session_state.get("use_pretrained_vectors", False),
+                              corpus=training_corpus())
+        plot_wv = vocabulary_for_sentences(wv, tokenized_sentences)
+        word_vectors = plot_wv.vectors
 
         if word_vectors.shape[0] < 3 or word_vectors.shape[1] < 3:
             st.error("❌ Not enough data to perform PCA.")
             return
 
-        reduced_vectors = PCA(n_components=3).fit_transform(word_vectors)
-        cmap = plt.get_cmap('tab20', len(tokenized_sentences))
-        hex_colors = ['#%02x%02x%02x' % (int(r*255), int(g*255), int(b*255)) for r, g, b, a in [cmap(i) for i in range(len(tokenized_sentences))]]
-
-        word_colors = []
-        for word in model.wv.index_to_key:
-            for i, sentence in enumerate(tokenized_sentences):
-                if word in sentence:
-                    word_colors.append(hex_colors[i])
-                    break
+        reduced_vectors = project_vectors(plot_wv)
+        hex_colors = sentence_hex_colors(len(tokenized_sentences))
+        colors = word_colors(plot_wv.index_to_key, tokenized_sentences, hex_colors)
 
         fig = go.Figure()
-        fig.add_trace(_draw_scatter(reduced_vectors, model, word_colors))
-        fig.add_traces(_draw_lines(reduced_vectors, model, tokenized_sentences, hex_colors))
+        points = downsample_words(plot_wv.index_to_key, reduced_vectors, colors, **plot_options)
+        fig.add_trace(_draw_scatter(points))
+        fig.add_traces(_draw_lines(reduced_vectors, plot_wv, tokenized_sentences, hex_colors))
 
         fig.update_layout(
             scene=dict(xaxis_title="X", yaxis_title="Y", zaxis_title="Z"),
@@ -120,6 +120,7 @@ def run(sentences):
         )
 
 
+        show_payload_size(fig, len(points["idx"]), len(plot_wv.index_to_key))
         st.plotly_chart(fig, use_container_width=True, key=f"view3d_plot_{int(time.time()*1000)}")
 
     with st.expander("📄 Show Input Sentences", expanded=False):
@@ -4,13 +4,24 @@ import matplotlib.pyplot as plt
 from wordcloud import WordCloud
 import jieba
 from collections import Counter
-from analyze_esg import display_esg_analysis
+from analyze_esg import display_esg_analysis, load_esg_keywords, EsgPageIndex
 from pdf_context import *
 from qa_utils.Word2vec import view_2d, view_3d, skipgram, cbow, negative_sampling
 import re
 
+def get_esg_page_index(page_store):
+    """Per-page ESG counts for the current PDF; only pages parsed since the last call are scored."""
+    index = st.session_state.get("esg_page_index")
+    if index is None or st.session_state.get("esg_page_index_source") is not page_store:
+        index = EsgPageIndex(load_esg_keywords())
+        st.session_state["esg_page_index"] = index
+        st.session_state["esg_page_index_source"] = page_store
+    index.update(page_store)
+    return index
+
 def generate_response(prompt):
-    pdf_context = get_pdf_context()
+    # 只在需要時才組出全文，避免每個 prompt 都重新串接整份 PDF
+    page_store = get_page_store()
     original_prompt = prompt
     prompt = prompt.strip().lower()
 
@@ -37,7 +48,8 @@ def generate_response(prompt):
         "negative sampling",
     ]
 
-    if prompt not in prompt_lists and "show pdf page" not in prompt:        
+    if prompt not in prompt_lists and "show pdf page" not in prompt and \
+        not prompt.startswith("which dimension is emphasized"):
         return (
             "📝 It looks like your prompt might not match the expected operations.\n\n"
             "💡 Try entering prompts like:\n"
@@ -46,15 +58,17 @@ def generate_response(prompt):
             "- Vector Semantics - Word2vec\n"
             "- Clustering analysis\n"
             "- ESG analysis\n\n"
-            "- Which dimension is emphasized\n\n"
+            "- Which dimension is emphasized\n"
+            "- Which dimension is emphasized in pages <start>-<end>\n\n"
             "📄 Also, make sure you've uploaded a PDF file first!"
         )
 
-    if (prompt == "show content" and not pdf_context) or \
-        ("show pdf page" in prompt and not pdf_context):
+    if (prompt == "show content" and page_store is None) or \
+        ("show pdf page" in prompt and page_store is None):
         return f"Please upload a PDF file to get context."
 
     elif prompt == "show content":
+        pdf_context = get_pdf_context()
         # {pdf_context[:1000]}
         return f"""
         🤖 Here's what I found from the uploaded PDF:\n
@@ -98,10 +112,23 @@ def generate_response(prompt):
 
         return f"🌱 Working on ESG analysis..."
     
-    elif prompt == "which dimension is emphasized":
-        all_text = " ".join([p["content"] for p in st.session_state["pdf_text"]])
+    elif prompt.startswith("which dimension is emphasized"):
+        if page_store is None:
+            return "Please upload a PDF file to get context."
+
         filename = st.session_state.get("uploaded_filename", "Uploaded_File.pdf")
-        display_esg_analysis(all_text, filename)  
+        page_index = get_esg_page_index(page_store)
+
+        match = re.search(r"pages? (\d+)(?:\s*-\s*(\d+))?", prompt)
+        if match:
+            start = int(match.group(1))
+            end = int(match.group(2) or start)
+            text = " ".join([p["content"] for p in page_store.page_range(start, end)])
+            display_esg_analysis(text, filename, page_index=page_index, page_range=(start, end))
+        elif prompt == "which dimension is emphasized":
+            display_esg_analysis(page_store.plain_text(), filename, page_index=page_index)
+        else:
+            return "⚠️ Please specify the pages, e.g., `Which dimension is emphasized in pages 3-10`."
         return ""
     
     # 加一個 fallback return，防止漏掉時回傳 None
@@ -0,0 +1,71 @@
+import os
+import re
+import time
+
+# 串流設定，皆可用環境變數覆寫
+STREAM_CHUNK_CHARS = max(1, int(os.environ.get("STREAM_CHUNK_CHARS", 400)))    # 每次送出約多少字元（至少 1）
+STREAM_MAX_INTERVAL = float(os.environ.get("STREAM_MAX_INTERVAL", 0.1))         # 生成器太慢時，累積多久就先送出
+STREAM_DELAY = float(os.environ.get("STREAM_DELAY", 0))                         # 每個 chunk 之間的人工延遲（預設不延遲）
+STREAM_MAX_TOTAL_DELAY = float(os.environ.get("STREAM_MAX_TOTAL_DELAY", 1.0))   # 單次回覆人工延遲的總上限
+
+# 切 chunk 時可接受的斷點：空白或中文標點
+_BREAK = re.compile(r"[\s。！？，、；：」』）]")
+
+def _split_text(text, chunk_chars, lookahead=None):
+    """Cut ``text`` into pieces of about ``chunk_chars``.
+
+    Each cut is moved forward to the next whitespace or CJK punctuation within ``lookahead``
+    characters (default a quarter chunk); text without such a break (e.g. a long Chinese
+    run) is cut hard at ``chunk_chars``.
+    """
+    chunk_chars = max(1, chunk_chars)  # <= 0 時切點不會前進，迴圈停不下來
+    lookahead = chunk_chars // 4 if lookahead is None else lookahead
+    start = 0
+    while start < len(text):
+        end = start + chunk_chars
+        if end < len(text):
+            match = _BREAK.search(text, end, end + lookahead)
+            if match:
+                end = match.end()
+        yield text[start:end]
+        start = end
+
+def stream_chunks(source, chunk_chars=STREAM_CHUNK_CHARS, max_interval=STREAM_MAX_INTERVAL,
+                  delay=STREAM_DELAY, max_total_delay=STREAM_MAX_TOTAL_DELAY):
+    """Re-chunk a string or an iterable of strings for ``st.write_stream``.
+
+    Pieces are buffered until about ``chunk_chars`` characters are ready, or until
+    ``max_interval`` seconds have passed since the last flush (so a slow generator
+    still shows progress). ``delay`` is optional pacing between chunks, capped at
+    ``max_total_delay`` seconds per response.
+    """
+    pieces = [source] if isinstance(source, str) else source
+    slept = 0.0
+
+    def pace():
+        nonlocal slept
+        if delay > 0 and slept < max_total_delay:
+            pause = min(delay, max_total_delay - slept)
+            time.sleep(pause)
+            slept += pause
+
+    buffer = []
+    buffered = 0
+    last_flush = time.monotonic()
+    for piece in pieces:
+        if not piece:
+            continue
+        buffer.append(str(piece))
+        buffered += len(buffer[-1])
+        if buffered < chunk_chars and time.monotonic() - last_flush < max_interval:
+            continue
+        text = "".join(buffer)
+        buffer, buffered = [], 0
+        for chunk in _split_text(text, chunk_chars):
+            yield chunk
+            pace()
+        last_flush = time.monotonic()
+    if buffer:
+        for chunk in _split_text("".join(buffer), chunk_chars):
+            yield chunk
+            pace()
@@ -1,50 +1,106 @@
 import streamlit as st
 from openai import OpenAI
-import time
 import re
-import requests
+import uuid
+import hashlib
+import secrets
 import fitz
 import json
-from db_utils import init_db, get_user_profile, save_user_profile
+from db_utils import init_db, save_user_profile, append_chat_message, get_chat_messages, \
+    CHAT_PAGE_SIZE, get_or_create_user_profile
 from qa_utils.Word2vec import view_2d, view_3d, cbow, skipgram, negative_sampling
+from qa_utils.Word2vec.model_cache import pretrained_vectors_available
 from ui_utils import render_pdf_upload_section, show_dismissible_alert
+from avatar_utils import avatar_status, DEFAULT_AVATAR_URL
+from stream_utils import stream_chunks
 from pdf_context import *
 from response_generator import generate_response
 
-def stream_data(stream_str):
-    for word in stream_str.split(" "):
-        yield word + " "
-        time.sleep(0.15)
+USER_ID_PARAM = "uid"  # 網址上的使用者識別參數，重新整理後仍能找回同一份資料
 
-def is_valid_image_url(url):
-    try:
-        response = requests.get(url, timeout=2)
-        if response.status_code == 200 and 'image' in response.headers["Content-Type"]:
-            return True
+_USER_ID_PATTERN = re.compile(r"[0-9a-f]{32}")  # 只接受本程式產生的 uuid4 hex
+
+def get_user_id():
+    """Per-user key for the profile store: a valid ``?uid=`` if present, else a new uuid written back to the URL.
+
+    Anything that is not a uuid4 hex (e.g. ``?uid=default``) gets a fresh id, so a link cannot
+    address reserved or other hand-made keys.
+    """
+    if "user_id" not in st.session_state:
+        user_id = st.query_params.get(USER_ID_PARAM, "")
+        if not _USER_ID_PATTERN.fullmatch(user_id):
+            user_id = uuid.uuid4().hex
+            st.query_params[USER_ID_PARAM] = user_id
+        st.session_state["user_id"] = user_id
+    return st.session_state["user_id"]
+
+CHAT_COOKIE = "chat_token"              # 聊天紀錄的擁有者憑證放在 cookie，不放在可分享的網址上
+CHAT_COOKIE_MAX_AGE = 365 * 24 * 3600
+
+def _set_chat_cookie(token):
+    # st.html 執行 script 需要 streamlit>=1.51；舊的 components.v1.html 已棄用，2026-06-01 之後移除
+    st.html(
+        f"<script>document.cookie = '{CHAT_COOKIE}={token}; path=/; "
+        f"max-age={CHAT_COOKIE_MAX_AGE}; SameSite=Strict';</script>",
+        unsafe_allow_javascript=True,
+    )
+
+def get_chat_owner_id():
+    """Key of the persisted chat history; unlike ``?uid=`` it is never part of a shareable link.
+
+    Logged-in users (Streamlit auth) are keyed by their account. Anonymous browsers get a random
+    token in a cookie; only its hash is stored in the database.
+    """
+    if "chat_owner_id" not in st.session_state:
+        user = getattr(st, "user", None)
+        if user is not None and getattr(user, "is_logged_in", False):
+            identity = user.get("sub") or user.get("email")
+            owner_id = "auth:" + hashlib.sha256(str(identity).encode("utf-8")).hexdigest()
         else:
-            return False
-    except:
-        return False
+            token = st.context.cookies.get(CHAT_COOKIE, "")
+            if not re.fullmatch(r"[0-9a-f]{32}", token):
+                token = secrets.token_hex(16)
+                _set_chat_cookie(token)
+            owner_id = "anon:" + hashlib.sha256(token.encode("utf-8")).hexdigest()
+        st.session_state["chat_owner_id"] = owner_id
+    return st.session_state["chat_owner_id"]
+
+def stream_data(response):
+    """Chunked stream of a reply (string or generator of strings) for ``write_stream``."""
+    return stream_chunks(response)
 
 def load_example_from_json(json_path, key):
     with open(json_path, "r", encoding="utf-8") as f:
         data = json.load(f)
     return data.get(key, "")
 
+@st.fragment(run_every=1)
+def _await_avatar_check(url):
+    """Only shown while the first check of ``url`` is running; reruns the app once it has a result."""
+    if avatar_status(url) is None:
+        st.caption("⏳ Checking avatar URL…")
+    else:
+        st.rerun()
+
 def render_sidebar():
     with st.sidebar:
         st_c_1 = st.container(border=True)
         with st_c_1:
-            user_image = st.session_state.get("user_image", "https://www.w3schools.com/howto/img_avatar.png")
-            if user_image and is_valid_image_url(user_image):
+            user_image = st.session_state.get("user_image", DEFAULT_AVATAR_URL)
+            # 背景檢查網址，這裡只讀取上次的結果，不阻塞畫面
+            avatar_valid = avatar_status(user_image) if user_image else False
+            if avatar_valid:
                 st.image(user_image)
+            elif avatar_valid is None:
+                st.image(DEFAULT_AVATAR_URL)
+                _await_avatar_check(user_image)
             else:
                 show_dismissible_alert(
                     "avatar_warning",
                     "⚠️ Invalid avatar URL.<br>Showing default image.<br>Image Ref: <a href='https://unsplash.com/' target='_blank'>https://unsplash.com/</a>",
                     alert_type="warning"
                 )
-                st.image("https://www.w3schools.com/howto/img_avatar.png")
+                st.image(DEFAULT_AVATAR_URL)
 
         st.markdown("---")
 
@@ -77,7 +133,7 @@ def render_sidebar():
                 submitted = st.form_submit_button("💾 Save Profile")
 
                 if submitted:
-                    save_user_profile(new_name, new_image)
+                    save_user_profile(get_user_id(), new_name, new_image)
                     st.session_state["user_name"] = new_name
                     st.session_state["user_image"] = new_image
                     st.success("Profile saved! Please refresh to see changes.")
@@ -93,6 +149,21 @@ def render_vector_task_section():
     st.session_state.setdefault("user_input_text", "")
     st.session_state.setdefault("input_sentences", [])
 
+    if pretrained_vectors_available():
+        st.checkbox(
+            "📚 Use pretrained report-corpus embeddings (your sentences are only used for selection and plotting)",
+            key="use_pretrained_vectors"
+        )
+
+    if "pdf_text" in st.session_state:
+        st.checkbox(
+            "📄 Train embeddings on the uploaded PDF (your sentences are only used for selection and plotting)",
+            key="use_pdf_corpus"
+        )
+        job = st.session_state.get("pdf_job")
+        if st.session_state.get("use_pdf_corpus") and job and not job["done"]:
+            st.info("⏳ The PDF is still being parsed; your sentences are used for training until it finishes.")
+
     if st.button("🔖 Load Example Sentences"):
         example_text = load_example_from_json("db/examples.json", "vector semantic example")
         st.session_state["user_input_text"] = example_text
@@ -115,32 +186,65 @@ def render_vector_task_section():
     if st.session_state.get("input_sentences"):
         st.session_state["vector_task_function"](sentences=st.session_state["input_sentences"])
 
+CHAT_WINDOW = CHAT_PAGE_SIZE    # 每次 rerun 最多畫幾則訊息
+CHAT_PREVIEW_CHARS = 3000       # 過長的訊息（例如 show content）先只顯示開頭
+
+def _render_chat_message(container, msg):
+    if msg["role"] == "user":
+        chat_message = container.chat_message(msg["role"], avatar=st.session_state.get("user_image", ""))
+    elif msg["role"] == "assistant" or not msg.get("image"):
+        chat_message = container.chat_message(msg["role"])
+    else:
+        chat_message = container.chat_message(msg["role"], avatar=msg["image"])
+
+    content = msg["content"]
+    if len(content) <= CHAT_PREVIEW_CHARS:
+        chat_message.markdown(content)
+        return
+    with chat_message:
+        if st.toggle(f"Show full message ({len(content):,} characters)", key=f"chat_full_{msg.get('id')}"):
+            st.markdown(content)
+        else:
+            st.markdown(content[:CHAT_PREVIEW_CHARS] + " …")
+
+def _load_older_messages(user_id):
+    messages = st.session_state.messages
+    before_id = messages[0]["id"] if messages else None
+    older, has_older = get_chat_messages(user_id, before_id=before_id, limit=CHAT_PAGE_SIZE)
+    st.session_state.messages = older + messages
+    st.session_state.chat_has_older = has_older
+
 def render_chat_section():
     st_c_chat = st.container(border=True)
+    owner_id = get_chat_owner_id()
 
+    # 只從資料庫載入最近一頁，較舊的訊息按需載入
     if "messages" not in st.session_state:
-        st.session_state.messages = []
-    else:
-        for msg in st.session_state.messages:
-            if msg["role"] == "user":
-                st_c_chat.chat_message(msg["role"], avatar=st.session_state.get("user_image", "")).markdown((msg["content"]))
-            elif msg["role"] == "assistant":
-                st_c_chat.chat_message(msg["role"]).markdown((msg["content"]))
-            else:
-                image_tmp = msg.get("image")
-                if image_tmp:
-                    st_c_chat.chat_message(msg["role"], avatar=image_tmp).markdown((msg["content"]))
-                else:
-                    st_c_chat.chat_message(msg["role"]).markdown((msg["content"]))
+        st.session_state.messages, st.session_state.chat_has_older = get_chat_messages(owner_id, limit=CHAT_WINDOW)
+
+    if st.session_state.get("chat_has_older"):
+        st_c_chat.button("⬆️ Load older messages", key="chat_load_older",
+                         on_click=_load_older_messages, args=(owner_id,))
+    for msg in st.session_state.messages:
+        _render_chat_message(st_c_chat, msg)
+
+    def remember(message):
+        st.session_state.messages.append(message)
+        # 新訊息進來時回到最近的視窗，維持每次 rerun 的繪製量固定
+        if len(st.session_state.messages) > CHAT_WINDOW:
+            st.session_state.messages = st.session_state.messages[-CHAT_WINDOW:]
+            st.session_state.chat_has_older = True
 
     def chat(prompt: str):
-        chat_user_image = st.session_state.get("user_image", "https://www.w3schools.com/howto/img_avatar.png")
+        chat_user_image = st.session_state.get("user_image", DEFAULT_AVATAR_URL)
         st_c_chat.chat_message("user", avatar=chat_user_image).write(prompt)
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        remember(append_chat_message(owner_id, "user", prompt))
 
         response = generate_response(prompt)
-        st.session_state.messages.append({"role": "assistant", "content": response})
-        st_c_chat.chat_message("assistant").write_stream(stream_data(response))
+        # write_stream 回傳完整文字，生成器產生的回覆也能寫入紀錄
+        streamed = st_c_chat.chat_message("assistant").write_stream(stream_data(response))
+        content = streamed if isinstance(streamed, str) else "".join(map(str, streamed))
+        remember(append_chat_message(owner_id, "assistant", content))
 
     if prompt := st.chat_input(placeholder="Please input your command", key="chat_bot"):
         chat(prompt)
@@ -170,7 +274,8 @@ def main():
         page_icon="img/favicon.ico"
     )
     init_db()
-    profile = get_user_profile()
+    # 還沒存過資料的使用者複製一份預設（舊版單一 profile 搬移過來的）資料
+    profile = get_or_create_user_profile(get_user_id())
 
     if profile:
         st.session_state.setdefault("user_name", profile.get("user_name", "Ella"))
@@ -0,0 +1,113 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from avatar_utils import AvatarValidator, check_image_url
+
+class StubHandler(BaseHTTPRequestHandler):
+    """/avatar.png: image; /page.html: not an image; /no-head.png: rejects HEAD, serves image on GET."""
+
+    requests_seen = []
+
+    def _reply(self, status, content_type, body=b""):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.requests_seen.append(("HEAD", self.path, self.headers.get("Range")))
+        if self.path == "/avatar.png":
+            self._reply(200, "image/png")
+        elif self.path == "/page.html":
+            self._reply(200, "text/html")
+        elif self.path == "/no-head.png":
+            self._reply(405, "text/plain")
+        else:
+            self._reply(404, "text/plain")
+
+    def do_GET(self):
+        self.requests_seen.append(("GET", self.path, self.headers.get("Range")))
+        if self.path == "/no-head.png":
+            self._reply(206, "image/png", b"x")
+        else:
+            self._reply(404, "text/plain")
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture(scope="module")
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+@pytest.mark.parametrize("path, expected", [
+    ("/avatar.png", True),
+    ("/page.html", False),
+    ("/no-head.png", True),
+    ("/missing.png", False),
+])
+def test_check_image_url(stub_server, path, expected):
+    assert check_image_url(stub_server + path) is expected
+
+def test_check_image_url_unreachable():
+    assert check_image_url("http://127.0.0.1:9/avatar.png", timeout=1) is False
+
+def test_head_less_server_gets_single_byte_range(stub_server):
+    StubHandler.requests_seen.clear()
+    assert check_image_url(stub_server + "/no-head.png")
+    assert ("GET", "/no-head.png", "bytes=0-0") in StubHandler.requests_seen
+
+def test_validator_is_non_blocking_and_caches(stub_server):
+    validator = AvatarValidator()
+    url = stub_server + "/avatar.png"
+    assert validator.status(url) is None
+    assert validator.wait(url, timeout=5) is True
+
+    StubHandler.requests_seen.clear()
+    assert validator.status(url) is True
+    assert StubHandler.requests_seen == []
+
+def test_validator_caches_negative_results(stub_server):
+    validator = AvatarValidator()
+    url = stub_server + "/page.html"
+    validator.status(url)
+    assert validator.wait(url, timeout=5) is False
+
+    StubHandler.requests_seen.clear()
+    assert validator.status(url) is False
+    assert StubHandler.requests_seen == []
+
+def test_validator_rechecks_after_ttl():
+    now = [0.0]
+    calls = []
+
+    def checker(url):
+        calls.append(url)
+        return False
+
+    validator = AvatarValidator(checker=checker, invalid_ttl=10, clock=lambda: now[0])
+    validator.status("u")
+    validator.wait("u", timeout=5)
+    now[0] = 5
+    assert validator.status("u") is False
+    assert len(calls) == 1
+
+    # 過期後先回傳舊結果，同時在背景重新檢查
+    now[0] = 20
+    assert validator.status("u") is False
+    validator.wait("u", timeout=5)
+    assert len(calls) == 2
+
+def test_validator_unreachable_url():
+    validator = AvatarValidator()
+    url = "http://127.0.0.1:9/avatar.png"
+    validator.status(url)
+    assert validator.wait(url, timeout=5) is False
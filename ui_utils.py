@@ -1,23 +1,110 @@
+import threading
 import fitz  # PyMuPDF
 import streamlit as st
 from pdf_context import *
+from pdf_cache import make_cache_key, get_cached_pages, save_cached_pages, save_source_pdf
 
 # pdf upload section
+def _ingest_pdf(job, pdf_bytes, cache_key):
+    """Background thread: parse pages into job["pages"] as they finish (no Streamlit calls here)."""
+    try:
+        # 頁數夠多時交給 process pool 平行解析（各 worker 重新開啟 pdf bytes），小檔直接在此執行緒解析
+        for entry in iter_text_parallel(pdf_bytes, job["total"], max_pages=job["total"],
+                                        extract_tables=DEFAULT_TABLE_MODE, timings=job["timings"]):
+            if job["cancelled"]:
+                return
+            job["pages"].append(entry)
+        report_timings(job["timings"])
+        save_cached_pages(cache_key, job["pages"])
+    except Exception as e:
+        print(f"(_ingest_pdf) Error parsing PDF: {e}")
+        job["error"] = str(e)
+    finally:
+        job["done"] = True
+
+def start_pdf_ingestion(pdf_bytes, total_pages, cache_key):
+    job = {
+        "total": total_pages,
+        "pages": PageStore(),
+        "timings": [],
+        "done": False,
+        "cancelled": False,
+        "error": None,
+    }
+    # pdf_text 與 job["pages"] 是同一個 PageStore，解析中的頁面可以立即被 get_pdf_context 讀到
+    st.session_state["pdf_job"] = job
+    st.session_state["pdf_text"] = job["pages"]
+    st.session_state["pdf_timings"] = job["timings"]
+    threading.Thread(target=_ingest_pdf, args=(job, pdf_bytes, cache_key), daemon=True).start()
+
+@st.fragment(run_every=1)
+def _render_ingest_progress():
+    job = st.session_state.get("pdf_job")
+    if job is None:
+        return
+    parsed = len(job["pages"])
+    st.progress(min(parsed / max(job["total"], 1), 1.0), text=f"⏳ Parsing PDF... {parsed}/{job['total']} pages")
+    if job["done"]:
+        st.rerun()
+
 def render_pdf_upload_section():
     with st.expander("📄 Upload a PDF file", expanded=True):
         uploaded_file = st.file_uploader("Upload PDF file", type=["pdf"], label_visibility="collapsed")
 
         # 若已解析 pdf 就不要重複執行
         if uploaded_file and "pdf_text" not in st.session_state:
-            doc = fitz.open(stream=uploaded_file.read(), filetype="pdf")
-            extracted = extract_text_by_page(doc, max_pages=len(doc))
-            st.session_state["pdf_text"] = extracted
-            st.success("✅ PDF uploaded and parsed successfully!")
+            pdf_bytes = uploaded_file.read()
+            doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+            cache_key = make_cache_key(pdf_bytes, max_pages=len(doc), extract_tables=DEFAULT_TABLE_MODE)
+            # 原始 PDF 存到快取目錄，session 只記內容雜湊，供 get_pdf_context(page=n) 補抽表格
+            st.session_state["pdf_source"] = save_source_pdf(pdf_bytes)
+            extracted = get_cached_pages(cache_key)
+            if extracted is None:
+                start_pdf_ingestion(pdf_bytes, len(doc), cache_key)
+            else:
+                st.session_state["pdf_text"] = extracted
+                st.session_state["pdf_timings"] = []
+                st.success("✅ PDF uploaded and parsed successfully!")
+
+        job = st.session_state.get("pdf_job")
+        if job and not job["done"]:
+            _render_ingest_progress()
+        elif job:
+            if job["error"]:
+                st.error(f"❌ Error parsing PDF: {job['error']}")
+            else:
+                st.success("✅ PDF uploaded and parsed successfully!")
+            del st.session_state["pdf_job"]
+
+        # Per-page parse timings
+        if st.session_state.get("pdf_timings") and not (job and not job["done"]):
+            with st.expander("⏱️ Parse timings", expanded=False):
+                timings = st.session_state["pdf_timings"]
+                checked = sum(1 for t in timings if t["tables_checked"])
+                st.caption(
+                    f"Text: {sum(t['text_ms'] for t in timings):.0f} ms · "
+                    f"Tables: {sum(t['tables_ms'] for t in timings):.0f} ms · "
+                    f"{checked}/{len(timings)} pages checked for tables"
+                )
+                st.dataframe(timings, use_container_width=True)
+
+        # Memory footprint of the parsed document in this session
+        store = st.session_state.get("pdf_text")
+        if isinstance(store, PageStore) and len(store):
+            footprint = store.memory_footprint()
+            st.caption(
+                f"💾 Session memory: {footprint['resident'] / 1024:.0f} KB "
+                f"(text buffer {footprint['buffer'] / 1024:.0f} KB"
+                f"{', memory-mapped from cache' if footprint['mapped'] else ''})"
+            )
 
         # Clear button
         if "pdf_text" in st.session_state:
             if st.button("🗑️ Clear PDF"):
-                del st.session_state["pdf_text"]
+                if job:
+                    job["cancelled"] = True
+                for key in ["pdf_text", "pdf_source", "pdf_timings", "pdf_job"]:
+                    st.session_state.pop(key, None)
                 st.rerun()
 
 # alert section